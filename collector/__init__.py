@@ -1 +1,5 @@
 from .collector import *
+from .availability import *
+from .cache import *
+from .memo import *
+from .sources import *
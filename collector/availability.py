@@ -0,0 +1,233 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""--- availability.py ---
+
+On-disk index of the data sources have for each symbol.
+
+@author   Hank Adler
+@version  0.1.0
+@license  MIT
+
+--- Copyright (C) 2020 Hank Adler ---
+"""
+
+
+import glob
+import json
+import os
+import re
+import threading
+import time
+
+import pandas as pd
+
+from markets import MarketCalendar
+
+
+class AvailabilityIndex:
+    """Records which (interval, period) requests a source has data for.
+
+    Entries are keyed by (symbol, source), each a JSON file holding the
+    outcome of every period requested per interval and the earliest bar seen
+    per interval. Outcomes older than `ttl` are forgotten, so new listings
+    and recovered feeds get probed again. A request only counts as having
+    no data after `misses` empty responses in a row, so a single failed
+    fetch doesn't blacklist it.
+
+    Args:
+        dir (str): Directory holding the entries.
+        ttl (float): Seconds an outcome stays valid.
+        misses (int): Empty responses in a row before a request is known to
+            have no data.
+
+    Attributes:
+        GAP (int): Sessions with no bars a period-bounded request must show
+            after its start before its first bar is taken as the listing.
+        dir (str): Directory holding the entries.
+        ttl (float): Seconds an outcome stays valid.
+        misses (int): Empty responses in a row before a request is known to
+            have no data.
+
+    Entry fields:
+        empty (float): When the source was found to have no data for the
+            symbol at all, i.e. for period='max' of daily or longer bars, or
+            None.
+        listed (str): First bar of the symbol, known once a period='max'
+            request of daily or longer bars returned it, or a request's bars
+            started `GAP` sessions after its period did. None until then.
+        intervals (dict): keys=intervals, values=dicts with fields:
+            first (str): Earliest bar seen or None.
+            periods (dict): keys=periods, values=[has data (bool), when
+                checked (float), empty responses in a row (int)].
+    """
+    GAP = 5
+
+    def __init__(self, dir: str, ttl=86400, misses=2):
+        self.dir = dir
+        self.ttl = ttl
+        self.misses = misses
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _path(self, symbol: str, source: str):
+        return f'{self.dir}/{source}/{symbol}.json'
+
+    def _entry(self, symbol: str, source: str):
+        """Returns the entry, loading it on first use. Call under `_lock`."""
+        key = (symbol, source)
+        if key not in self._entries:
+            try:
+                with open(self._path(symbol, source), 'r') as f:
+                    self._entries[key] = json.load(f)
+            except (OSError, ValueError):
+                self._entries[key] = {'empty': None, 'intervals': {}}
+            self._entries[key].setdefault('listed', None)
+        return self._entries[key]
+
+    def _fresh(self, checked: float):
+        return checked is not None and time.time() - checked < self.ttl
+
+    def _outcome(self, bars: dict, period: str):
+        """Returns [has data, when checked, empty responses in a row] of
+        `period`, or None if it was never requested."""
+        outcome = bars['periods'].get(period)
+        if outcome is None or len(outcome) == 3:
+            return outcome
+        # Entries written before streaks were kept hold one outcome.
+        has_data, checked = outcome
+        return [has_data, checked, 0 if has_data else 1]
+
+    def record(self, symbol: str, source: str, interval: str, period: str,
+               history: pd.DataFrame):
+        """Records the outcome of requesting `period` of `interval` bars.
+
+        Parameters:
+            history (pd.DataFrame): History the source returned or None if it
+                had no data.
+        """
+        now = time.time()
+        intraday = re.match(r'[0-9]+[mh]$', interval) is not None
+        with self._lock:
+            entry = self._entry(symbol, source)
+            bars = entry['intervals'].setdefault(
+                interval, {'first': None, 'periods': {}})
+            if history is not None:
+                bars['periods'][period] = [True, now, 0]
+                entry['empty'] = None
+                first = history.index[0]
+                if bars['first'] is None or first < pd.Timestamp(bars['first']):
+                    bars['first'] = first.isoformat()
+                if self._reached(period, intraday, first) and (
+                        entry['listed'] is None
+                        or first < pd.Timestamp(entry['listed'])):
+                    entry['listed'] = first.isoformat()
+            else:
+                outcome = self._outcome(bars, period)
+                streak = 1
+                if (outcome is not None and not outcome[0]
+                        and self._fresh(outcome[1])):
+                    streak += outcome[2]
+                bars['periods'][period] = [False, now, streak]
+                # Intraday bars don't reach back that far, whatever the symbol.
+                if period == 'max' and not intraday and streak >= self.misses:
+                    entry['empty'] = now
+            self._save(symbol, source, entry)
+
+    @classmethod
+    def _reached(cls, period: str, intraday: bool, first: pd.Timestamp):
+        """Returns whether a `period` request whose first bar is `first`
+        reached back past the symbol's first bar.
+
+        Bars of a bounded period may start a session or two late (e.g. at a
+        boundary or around a halt), so only a gap of `GAP` sessions counts.
+        """
+        if period == 'max':
+            return not intraday
+        now = pd.Timestamp.now(tz=first.tz)
+        start = MarketCalendar.period_start(period, now)
+        return start < first and MarketCalendar.sessions_between(
+            start, first) >= cls.GAP
+
+    def known(self, symbol: str, source: str, interval: str, period: str):
+        """Returns whether the source has data for the request: True or False
+        if known, else None."""
+        with self._lock:
+            entry = self._entry(symbol, source)
+            if self._fresh(entry['empty']):
+                return False
+            bars = entry['intervals'].get(interval)
+            if bars is None or period not in bars['periods']:
+                return None
+            has_data, checked, streak = self._outcome(bars, period)
+            if not self._fresh(checked):
+                return None
+            if not has_data and streak < self.misses:
+                return None
+            return has_data
+
+    def empty(self, symbol: str, source: str):
+        """Returns whether the source is known to have no data for `symbol`."""
+        with self._lock:
+            return self._fresh(self._entry(symbol, source)['empty'])
+
+    def first(self, symbol: str, source: str, interval: str = None):
+        """Returns the earliest bar seen of `interval`, or of any interval if
+        None, as a pd.Timestamp. None if no bar has been seen."""
+        with self._lock:
+            intervals = self._entry(symbol, source)['intervals']
+            firsts = [pd.Timestamp(bars['first'])
+                      for name, bars in intervals.items()
+                      if bars['first'] is not None
+                      and interval in [None, name]]
+        return min(firsts) if firsts else None
+
+    def listed(self, symbol: str, source: str):
+        """Returns the first bar of `symbol` as a pd.Timestamp, or None if
+        unknown."""
+        with self._lock:
+            listed = self._entry(symbol, source)['listed']
+        return None if listed is None else pd.Timestamp(listed)
+
+    def periods(self, symbol: str, source: str, interval: str,
+                periods: list):
+        """Returns `periods` to try in turn, without those known to have no
+        data.
+
+        If the first bar of `symbol` is known, the shortest of `periods`
+        reaching back to it comes first and the longer ones, which can't
+        hold more bars, are dropped. Empty if the source is known to have no
+        data for `symbol`.
+        """
+        if self.empty(symbol, source):
+            return []
+        listed = self.listed(symbol, source)
+        if listed is not None:
+            now = pd.Timestamp.now(tz=listed.tz)
+            starts = {period: MarketCalendar.period_start(period, now)
+                      for period in periods}
+            covering = [period for period in periods
+                        if starts[period] is None or starts[period] <= listed]
+            if covering:
+                shortest = max(covering, key=lambda period: (
+                    starts[period] is not None, starts[period] or now))
+                periods = [shortest] + [period for period in periods
+                                        if period not in covering]
+        return [period for period in periods
+                if self.known(symbol, source, interval, period) is not False]
+
+    def invalidate(self, symbol='*', source='*'):
+        """Deletes the entries matching the arguments. Defaults match all."""
+        with self._lock:
+            for key in list(self._entries):
+                if symbol in ['*', key[0]] and source in ['*', key[1]]:
+                    del self._entries[key]
+            for path in glob.glob(self._path(symbol, source)):
+                os.remove(path)
+
+    def _save(self, symbol: str, source: str, entry: dict):
+        """Writes the entry, replacing any previous one atomically."""
+        path = self._path(symbol, source)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(entry, f)
+        os.replace(f'{path}.tmp', path)
@@ -0,0 +1,107 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""--- cache.py ---
+
+On-disk store of stock price histories.
+
+@author   Hank Adler
+@version  0.1.0
+@license  MIT
+
+--- Copyright (C) 2020 Hank Adler ---
+"""
+
+
+import glob
+import json
+import os
+import tempfile
+import threading
+
+import pandas as pd
+
+
+class HistoryCache:
+    """A columnar on-disk cache of price histories.
+
+    Entries are keyed by (symbol, interval, source). Each entry is a Parquet
+    file holding the bars plus a JSON sidecar describing them. Reads and
+    writes of an entry are serialized within the process, so concurrent
+    saves never mix the files of two writers.
+
+    Args:
+        dir (str): Directory holding the cache entries.
+
+    Attributes:
+        dir (str): Directory holding the cache entries.
+
+    Sidecar fields:
+        head (str): Earliest timestamp the entry is known to cover or None if
+            it reaches back to the first available bar (period='max').
+        until (str): When the entry was last topped up from the source.
+        rounding (int): Rounding the bars were fetched with.
+    """
+
+    def __init__(self, dir: str):
+        self.dir = dir
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _path(self, symbol: str, interval: str, source: str):
+        return f'{self.dir}/{source}/{interval}/{symbol}'
+
+    def _entry_lock(self, symbol: str, interval: str, source: str):
+        """Returns the lock of the entry."""
+        with self._lock:
+            return self._locks.setdefault(
+                (symbol, interval, source), threading.Lock())
+
+    def load(self, symbol: str, interval: str, source: str):
+        """Returns (history, meta) for the entry or (None, None) if missing."""
+        with self._entry_lock(symbol, interval, source):
+            meta = self.meta(symbol, interval, source)
+            if meta is None:
+                return None, None
+            try:
+                history = pd.read_parquet(
+                    f'{self._path(symbol, interval, source)}.parquet')
+            except (OSError, ValueError):
+                return None, None
+            return history, meta
+
+    def meta(self, symbol: str, interval: str, source: str):
+        """Returns the sidecar of the entry or None if missing."""
+        try:
+            with open(f'{self._path(symbol, interval, source)}.json', 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, symbol: str, interval: str, source: str,
+             history: pd.DataFrame, meta: dict):
+        """Writes the entry, replacing any previous one atomically."""
+        path = self._path(symbol, interval, source)
+        dir = os.path.dirname(path)
+        os.makedirs(dir, exist_ok=True)
+        with self._entry_lock(symbol, interval, source):
+            # Unique temporary names, so other processes can't clash either.
+            temps = []
+            try:
+                for suffix in ['.parquet', '.json']:
+                    fd, temp = tempfile.mkstemp(suffix=suffix, dir=dir)
+                    os.close(fd)
+                    temps.append(temp)
+                history.to_parquet(temps[0])
+                with open(temps[1], 'w') as f:
+                    json.dump(meta, f)
+                os.replace(temps[0], f'{path}.parquet')
+                os.replace(temps[1], f'{path}.json')
+            finally:
+                for temp in temps:
+                    if os.path.exists(temp):
+                        os.remove(temp)
+
+    def invalidate(self, symbol='*', interval='*', source='*'):
+        """Deletes the entries matching the arguments. Defaults match all."""
+        for path in glob.glob(self._path(symbol, interval, source) + '.*'):
+            os.remove(path)
@@ -12,10 +12,20 @@ Collects stock data from `source`.
 """
 
 
-import datetime as dt
+import asyncio
+import concurrent.futures as cf
+import functools
 import re
 
-import yfinance as yf
+import pandas as pd
+
+import config
+import utils
+from markets import MarketCalendar
+from .availability import AvailabilityIndex
+from .cache import HistoryCache
+from .memo import HistoryMemo
+from .sources import RateLimiter, ReplaySource, Source, YFinanceSource
 
 
 class Collector:
@@ -26,8 +36,25 @@ class Collector:
         MAX_PERIODS (list): Max periods allowed.
         VALID_INTERVALS (list): Valid intervals.
         DEFAULT_INTERVALS (dict): Default intervals per period.
+        OHLCV (dict): How each column is aggregated when resampling.
+        RESAMPLE_BASES (dict): Finer intervals, coarsest first, that each
+            interval can be resampled from.
+        FETCH_BASES (dict): Intervals fetched in place of the requested one
+            when no finer history is cached, since they cost the same
+            request and can be resampled afterwards.
+        MAX_WORKERS (int): Default number of threads used by `get_histories`.
+        MAX_IN_FLIGHT (int): Default cap on requests in flight in
+            `aget_histories`.
+        MEMO_TTLS (dict): Seconds memoized histories stay valid, keyed by
+            interval unit. Intraday bars expire sooner than daily ones.
+        memo (HistoryMemo): In-memory memo in front of `cache`.
+        cache (HistoryCache): On-disk cache consulted by `get_history`.
+        availability (AvailabilityIndex): Outcomes of past requests. Requests
+            known to have no data fail without reaching the source.
+        sources (dict): Backends of `SOURCES`, keyed by name. See
+            `register_source`.
     """
-    SOURCES = ['yfinance', 'iex']
+    SOURCES = ['yfinance', 'replay']
     MAX_PERIODS = ['730d', '104wk', '23mo', 'ytd', 'max']
     VALID_PERIODS = ['1d', '7d', '30d', '60d', '3mo', '6mo', '1y', '2y', '5y',
                      '10y', 'ytd', 'max']
@@ -37,11 +64,29 @@ class Collector:
     DEFAULT_INTERVALS = {'1d': '1m', '7d': '1m', '60d': '2m', '1mo': '2m',
                          '3mo': '60m', '6mo': '60m', 'ytd': '60m', '1y': '60m',
                          '2y': '60m', '5y': '1d', '10y': '1d', 'max': '1d'}
+    OHLCV = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last',
+             'Volume': 'sum'}
+    RESAMPLE_BASES = {'2m': ['1m'], '5m': ['1m'], '15m': ['5m', '1m'],
+                      '30m': ['15m', '5m', '2m', '1m'],
+                      '60m': ['30m', '15m', '5m', '2m', '1m'],
+                      '90m': ['30m', '15m', '5m', '2m', '1m'],
+                      '1h': ['30m', '15m', '5m', '2m', '1m'],
+                      '1wk': ['1d'], '1mo': ['1d'], '3mo': ['1d']}
+    FETCH_BASES = {'1wk': '1d', '1mo': '1d', '3mo': '1d'}
+    MAX_WORKERS = 16
+    MAX_IN_FLIGHT = 1000
+    MEMO_TTLS = {'m': 60, 'h': 60, 'd': 3600, 'wk': 3600, 'mo': 3600}
+    memo = HistoryMemo()
+    cache = HistoryCache(config.CACHE_DIR)
+    availability = AvailabilityIndex(config.AVAILABILITY_DIR)
+    sources = {'yfinance': YFinanceSource(limiter=RateLimiter(rate=10)),
+               'replay': ReplaySource(config.REPLAY_DIR)}
 
     @classmethod
     def get_history(
             cls, symbol: str, period='60d', interval=DEFAULT_INTERVALS['60d'],
-            start: str = None, end: str = None, rounding=2, source=SOURCES[0]):
+            start: str = None, end: str = None, rounding=2, source=SOURCES[0],
+            cache=True):
         """Gets `symbol` price history from `source`.
 
         Parameters:
@@ -52,11 +97,131 @@ class Collector:
             end (str): Date indicating period end.
             rounding (int): Number of significant digits in decimal.
             source (str): Data source. See `SOURCES`.
+            cache (bool): Whether to go through `memo`, `cache` and
+                `availability`. Pass False to bypass them and pull the whole
+                history from `source`. When True,
+                `interval` bars are resampled from finer cached bars if any
+                cover the requested window. See `RESAMPLE_BASES`.
 
         Returns:
             pd.DataFrame containing history or None if there was a problem
             pulling the data.
         """
+        cls._validate(period, interval, source)
+        try:
+            return cls._get_history(
+                symbol, period, interval, start, end, rounding, source, cache)
+        except Exception:
+            return None
+
+    @classmethod
+    def get_histories(
+            cls, symbols: list, period='60d',
+            interval=DEFAULT_INTERVALS['60d'], start: str = None,
+            end: str = None, rounding=2, source=SOURCES[0], cache=True,
+            workers=MAX_WORKERS):
+        """Gets price histories for `symbols` concurrently.
+
+        Fetches run on a pool of `workers` threads and are throttled by the
+        source's `limiter`. See `get_history` for the remaining parameters.
+
+        Parameters:
+            symbols (list): Stock symbols.
+            workers (int): Max number of concurrent fetches.
+
+        Returns:
+            tuple: (histories, failures) dicts keyed by symbol, in the order
+            of `symbols`. `histories` holds the pd.DataFrame pulled for each
+            symbol; `failures` holds the exception raised for each symbol
+            that couldn't be pulled.
+        """
+        cls._validate(period, interval, source)
+        histories = {}
+        failures = {}
+        with cf.ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                symbol: pool.submit(
+                    cls._get_history, symbol, period, interval, start, end,
+                    rounding, source, cache)
+                for symbol in symbols}
+            for symbol, future in futures.items():
+                try:
+                    histories[symbol] = future.result()
+                except Exception as e:
+                    failures[symbol] = e
+        return histories, failures
+
+    @classmethod
+    async def aget_history(
+            cls, symbol: str, period='60d', interval=DEFAULT_INTERVALS['60d'],
+            start: str = None, end: str = None, rounding=2, source=SOURCES[0],
+            cache=True):
+        """Async counterpart of `get_history`.
+
+        The fetch, parsing and prepost truncation run on the event loop's
+        default executor, so the loop is never blocked.
+        """
+        cls._validate(period, interval, source)
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(None, functools.partial(
+                cls._get_history, symbol, period, interval, start, end,
+                rounding, source, cache))
+        except Exception:
+            return None
+
+    @classmethod
+    async def aget_histories(
+            cls, symbols: list, period='60d',
+            interval=DEFAULT_INTERVALS['60d'], start: str = None,
+            end: str = None, rounding=2, source=SOURCES[0], cache=True,
+            max_in_flight=MAX_IN_FLIGHT, workers=None):
+        """Async counterpart of `get_histories`.
+
+        A semaphore keeps up to `max_in_flight` requests in flight. Their
+        blocking work runs on a pool of `workers` threads owned by the call,
+        each holding one request, so in flight requests are also capped by
+        `workers`. Threads are only started as requests need them. If the
+        call is cancelled, requests that haven't started are dropped and the
+        pool is shut down without waiting for the ones already running.
+
+        Parameters:
+            max_in_flight (int): Max number of requests in flight.
+            workers (int): Number of threads doing the blocking work.
+                Defaults to `max_in_flight`, one per request in flight.
+
+        Returns:
+            tuple: (histories, failures). See `get_histories`.
+        """
+        cls._validate(period, interval, source)
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(max_in_flight)
+        executor = cf.ThreadPoolExecutor(max_workers=workers or max_in_flight)
+
+        async def get(symbol):
+            async with semaphore:
+                return await loop.run_in_executor(executor, functools.partial(
+                    cls._get_history, symbol, period, interval, start, end,
+                    rounding, source, cache))
+
+        try:
+            results = await asyncio.gather(
+                *[get(symbol) for symbol in symbols], return_exceptions=True)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        histories = {}
+        failures = {}
+        for symbol, result in zip(symbols, results):
+            if isinstance(result, BaseException):
+                failures[symbol] = result
+            else:
+                histories[symbol] = result
+        return histories, failures
+
+    @classmethod
+    def _validate(cls, period: str, interval: str, source: str):
+        """Raises ValueError if any of the arguments is not valid."""
         # Validates `period`.
         match = re.match(r'([0-9]*)(d|wk|mo|y|ytd|max)', period)
         if not match:
@@ -74,47 +239,256 @@ class Collector:
         # Validates `sources`.
         if source not in cls.SOURCES:
             raise ValueError(
-                f'source = {value} is not valid!'
+                f'source = {source} is not valid!'
                 f'\nValid sources are: {cls.SOURCES}'
             )
 
-        if source == 'yfinance':
-            return cls._get_history_yf(
-                symbol, period, interval, start, end, rounding)
-        elif source == 'iex':
-            return cls._get_history_iex()
+    @classmethod
+    def _get_history(
+            cls, symbol, period, interval, start, end, rounding, source,
+            cache):
+        """Same as `get_history` but raises if the history can't be pulled."""
+        if not cache:
+            return cls._load_history(
+                symbol, period, interval, start, end, rounding, source, cache)
+        key = (symbol, period, interval, start, end, rounding, source)
+        ttl = cls.MEMO_TTLS[re.match(r'[0-9]*([a-z]+)', interval).group(1)]
+        history = cls.memo.get(key, ttl, functools.partial(
+            cls._load_history, symbol, period, interval, start, end, rounding,
+            source, cache))
+        # Copies so that callers adding columns don't alter the memo.
+        return history.copy()
 
     @classmethod
-    def _get_history_yf(
-            cls, symbol: str, period='60d', interval=DEFAULT_INTERVALS['60d'],
-            start: str = None, end: str = None, rounding=2):
-        """Gets `symbol` price history from Yahoo Finance.
+    def _load_history(
+            cls, symbol, period, interval, start, end, rounding, source,
+            cache):
+        """Loads the history `_get_history` memoizes.
 
-        `prepost` is set to True because yf otherwise does not include 4:00 PM
-        quotes. The remaining prepost data is subsequently truncated.
+        Requests for a `period` alone are recorded in `availability`, and
+        fail right away if it knows `source` has no data for them.
         """
+        probe = start is None and end is None
+        if (probe and cache and cls.availability.known(
+                symbol, source, interval, period) is False):
+            raise LookupError(f'{source} is known to have no {interval} data '
+                              f'for {symbol} over {period}!')
         try:
-            history = yf.Ticker(symbol).history(
-                period=period, interval=interval, start=start, end=end,
-                prepost=True, rounding=rounding)
-        except:
-            return None
+            history = cls._pull_history(
+                symbol, period, interval, start, end, rounding, source, cache)
+        except LookupError:
+            if probe:
+                cls.availability.record(symbol, source, interval, period, None)
+            raise
+        if probe:
+            cls.availability.record(symbol, source, interval, period, history)
+        return history
 
-        if history.empty:
-            return None
+    @classmethod
+    def _pull_history(
+            cls, symbol, period, interval, start, end, rounding, source,
+            cache):
+        """Pulls `symbol` history through `cache` or straight from `source`.
 
-        history = history.drop(columns=['Dividends', 'Stock Splits']).dropna()
+        Raises LookupError if there are no bars in the requested window.
+        """
+        if cache and cls.sources[source].CACHEABLE:
+            base = cls._resample_base(
+                symbol, period, interval, start, rounding, source)
+            history = cls._get_history_cached(
+                symbol, period, base, start, end, rounding, source)
+            if history is not None and base != interval:
+                history = cls.resample(history, interval)
+        else:
+            history = cls._fetch(
+                symbol, period, interval, start, end, rounding, source)
+        if history is None:
+            raise LookupError(
+                f'No {interval} bars for {symbol} in the requested window!')
+        return history
 
-        # Truncates prepost data.
-        if re.match(r'[0-9]+[mh]$', interval):
-            history = history.loc[history.index.time >= dt.time(9, 30)]
-            history = history.loc[history.index.time <= dt.time(16)]
+    @classmethod
+    def resample(cls, history, interval: str):
+        """Returns `history` aggregated into coarser `interval` bars.
 
+        Intraday bins are anchored at the 9:30 open, in wall time so they
+        stay aligned across daylight saving changes. Weekly bins start on
+        Mondays and monthly bins on the 1st, matching Yahoo Finance labels.
+
+        Parameters:
+            history (pd.DataFrame): index=Datetime,
+                columns=Open|High|Low|Close|Volume
+            interval (str): Target interval. See `RESAMPLE_BASES`.
+        """
+        n, unit = re.match(r'([0-9]+)(m|h|wk|mo)$', interval).groups()
+        n = int(n)
+        tz = history.index.tz
+        if unit in ['m', 'h']:
+            minutes = n * 60 if unit == 'h' else n
+            resampler = history.tz_localize(None).resample(
+                f'{minutes}min', origin='start_day',
+                offset=pd.Timedelta(minutes=(9 * 60 + 30) % minutes))
+        elif unit == 'wk':
+            resampler = history.resample(
+                f'{n}W-MON', label='left', closed='left')
+        elif n == 3:
+            resampler = history.resample('QS')
+        else:
+            resampler = history.resample(f'{n}MS')
+        history = resampler.agg(cls.OHLCV).dropna(subset=['Open'])
+        if unit in ['m', 'h']:
+            history = history.tz_localize(tz)
         return history
 
     @classmethod
-    def _get_history_iex(cls):
-        pass
+    def register_source(cls, name: str, source: Source):
+        """Makes `source` available as `name`, replacing any previous one."""
+        cls.sources[name] = source
+        if name not in cls.SOURCES:
+            cls.SOURCES.append(name)
+
+    @classmethod
+    def invalidate(cls, symbol='*', interval='*', source='*'):
+        """Drops cached histories matching the arguments. Defaults match all.
+
+        `memo` is cleared entirely, and `availability` for all intervals of
+        the matching symbols.
+        """
+        cls.memo.clear()
+        cls.cache.invalidate(symbol, interval, source)
+        cls.availability.invalidate(symbol, source)
+
+    @classmethod
+    def _fetch(cls, symbol, period, interval, start, end, rounding, source):
+        """Pulls `symbol` price history straight from `source`.
+
+        Raises LookupError if `source` has no data for `symbol`.
+        """
+        backend = cls.sources[source]
+        if backend.limiter is not None:
+            backend.limiter.wait()
+        history = backend.get_history(
+            symbol, period, interval, start, end, rounding)
+        if history is None or history.empty:
+            raise LookupError(f'{source} has no {interval} data for {symbol}!')
+        return history
+
+    @classmethod
+    def _resample_base(cls, symbol, period, interval, start, rounding, source):
+        """Returns the interval to pull from `cache` to get `interval` bars.
+
+        That's the coarsest finer interval already cached over the requested
+        window, else the `FETCH_BASES` one, else `interval` itself.
+        """
+        for base in cls.RESAMPLE_BASES.get(interval, []):
+            meta = cls.cache.meta(symbol, base, source)
+            if meta is None or meta['rounding'] != rounding:
+                continue
+            if meta['head'] is None:
+                return base
+            head = pd.Timestamp(meta['head'])
+            lo, _ = cls._window(
+                period, start, None, head.tz, pd.Timestamp.now(tz=head.tz))
+            if lo is not None and lo >= head:
+                return base
+        return cls.FETCH_BASES.get(interval, interval)
+
+    @classmethod
+    def _get_history_cached(
+            cls, symbol, period, interval, start, end, rounding, source):
+        """Gets `symbol` price history through `cache`.
+
+        An entry that reaches back far enough is topped up with the bars
+        after its last one; otherwise, or if topping it up fails, the whole
+        period is fetched and replaces it. Entries whose tail was fetched
+        less than one `interval` ago, or that already extend past `end`, are
+        served without touching `source`.
+        """
+        sessions = cls._sessions(period, start)
+        cached, meta = cls.cache.load(symbol, interval, source)
+        if cached is not None and meta['rounding'] != rounding:
+            cached = None
+
+        if cached is not None:
+            tz = cached.index.tz
+            now = pd.Timestamp.now(tz=tz)
+            lo, hi = cls._window(period, start, end, tz, now)
+            head = meta['head']
+            if head is not None:
+                head = utils.localize(head, tz)
+            until = utils.localize(meta['until'], tz)
+            if head is not None and (lo is None or lo < head):
+                cached = None
+            elif ((hi is not None and hi <= until)
+                    or now - until < utils.interval2timedelta(interval)):
+                return cls._slice(cached, lo, hi, sessions)
+            else:
+                tail_start = cached.index[-1].strftime('%Y-%m-%d')
+                try:
+                    tail = cls._fetch(
+                        symbol, period, interval, tail_start, None, rounding,
+                        source)
+                except Exception:
+                    # Refetched whole rather than served stale on every call.
+                    tail = None
+                    cached = None
+                if tail is not None:
+                    history = pd.concat(
+                        [cached.loc[cached.index < tail.index[0]], tail])
+                    meta['until'] = now.isoformat()
+
+        if cached is None:
+            # Fetches up to now so the entry's tail can be topped up later.
+            history = cls._fetch(
+                symbol, period, interval, start, None, rounding, source)
+            tz = history.index.tz
+            now = pd.Timestamp.now(tz=tz)
+            lo, hi = cls._window(period, start, end, tz, now)
+            meta = {'head': None if lo is None else lo.isoformat(),
+                    'until': now.isoformat(), 'rounding': rounding}
+
+        cls.cache.save(symbol, interval, source, history, meta)
+        return cls._slice(history, lo, hi, sessions)
+
+    @staticmethod
+    def _sessions(period, start):
+        """Returns the number of sessions `period` spans, or None unless it
+        counts sessions ('{n}d', as the sources do) and `start` is None."""
+        match = re.match(r'([0-9]+)d$', period or '')
+        if start is not None or match is None:
+            return None
+        return int(match.group(1))
+
+    @classmethod
+    def _window(cls, period, start, end, tz, now):
+        """Returns the (lo, hi) timestamps requested. Either may be None.
+
+        '{n}d' periods reach back to the start of the `n`-th last session.
+        """
+        if start is not None:
+            lo = utils.localize(start, tz)
+        else:
+            lo = MarketCalendar.period_start(period, now)
+        hi = None if end is None else utils.localize(end, tz)
+        return lo, hi
+
+    @staticmethod
+    def _slice(history, lo, hi, sessions=None):
+        """Returns the bars of `history` in [`lo`, `hi`) or None if empty.
+
+        If `sessions` is given, only bars of the last `sessions` days found
+        in that window are kept.
+        """
+        if lo is not None:
+            history = history.loc[history.index >= lo]
+        if hi is not None:
+            history = history.loc[history.index < hi]
+        if sessions is not None:
+            history = history.loc[
+                MarketCalendar.last_sessions(history.index, sessions)]
+        if history.empty:
+            return None
+        return history
 
 
 if __name__ == '__main__':
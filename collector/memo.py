@@ -0,0 +1,102 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""--- memo.py ---
+
+In-memory memo of stock price histories.
+
+@author   Hank Adler
+@version  0.1.0
+@license  MIT
+
+--- Copyright (C) 2020 Hank Adler ---
+"""
+
+
+import collections
+import concurrent.futures as cf
+import threading
+import time
+
+
+class HistoryMemo:
+    """A bounded LRU of histories whose entries expire after a TTL.
+
+    Concurrent lookups of a key that is being loaded wait for that load
+    instead of starting their own. Failed loads are not memoized.
+
+    Args:
+        size (int): Max number of entries.
+
+    Attributes:
+        size (int): Max number of entries.
+        hits (int): Lookups served from memory, including those that waited
+            on another caller's load.
+        misses (int): Lookups that had to load.
+        evictions (int): Entries dropped to stay within `size`.
+    """
+
+    def __init__(self, size=512):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: tuple, ttl: float, load):
+        """Returns the value memoized under `key`, calling `load()` on a miss.
+
+        Parameters:
+            key (tuple): Lookup key.
+            ttl (float): Seconds a freshly loaded value stays valid.
+            load (callable): Returns the value. Exceptions propagate to every
+                caller waiting on the load.
+        """
+        owner = False
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            future = self._loading.get(key)
+            if future is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+                future = self._loading[key] = cf.Future()
+                owner = True
+        if not owner:
+            return future.result()
+
+        try:
+            value = load()
+        except BaseException as e:
+            with self._lock:
+                del self._loading[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._loading[key]
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        future.set_result(value)
+        return value
+
+    def clear(self):
+        """Drops all entries. Counters are kept."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Returns the counters and current size as a dict."""
+        return {'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'size': len(self._entries)}
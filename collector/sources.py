@@ -0,0 +1,179 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""--- sources.py ---
+
+Backends from which stock data can be pulled.
+
+@author   Hank Adler
+@version  0.1.0
+@license  MIT
+
+--- Copyright (C) 2020 Hank Adler ---
+"""
+
+
+import os
+import re
+import threading
+import time
+
+import pandas as pd
+import yfinance as yf
+
+import utils
+from markets import MarketCalendar
+
+
+class RateLimiter:
+    """Spaces out calls so that no more than `rate` happen per second.
+
+    Shared by all threads, so it acts as a global limit.
+
+    Args:
+        rate (float): Max calls per second. None disables the limit.
+    """
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self):
+        """Blocks until the caller's turn comes up."""
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            turn = max(now, self._next)
+            self._next = turn + 1 / self.rate
+        time.sleep(turn - now)
+
+
+class Source:
+    """Base class of data-source backends.
+
+    Subclasses implement `get_history`. Register instances with
+    `Collector.register_source` to make them available by name.
+
+    Args:
+        limiter (RateLimiter): Limit on requests made to the source or None.
+
+    Attributes:
+        CACHEABLE (bool): Whether histories pulled from the source are worth
+            keeping in `Collector.cache`.
+        limiter (RateLimiter): Limit on requests made to the source or None.
+    """
+    CACHEABLE = True
+
+    def __init__(self, limiter: RateLimiter = None):
+        self.limiter = limiter
+
+    def get_history(self, symbol: str, period: str, interval: str,
+                    start: str, end: str, rounding: int):
+        """Gets `symbol` price history.
+
+        See `Collector.get_history` for the parameters.
+
+        Returns:
+            pd.DataFrame: index=Datetime, columns=Open|High|Low|Close|Volume
+            or None if the source has no data for `symbol`.
+        """
+        raise NotImplementedError
+
+
+class YFinanceSource(Source):
+    """Pulls histories from Yahoo Finance."""
+
+    def get_history(self, symbol: str, period: str, interval: str,
+                    start: str, end: str, rounding: int):
+        """Gets `symbol` price history from Yahoo Finance.
+
+        `prepost` is set to True because yf otherwise does not include 4:00 PM
+        quotes. The remaining prepost data, including bars past early closes,
+        is subsequently truncated. See `MarketCalendar.mask`.
+        """
+        history = yf.Ticker(symbol).history(
+            period=period, interval=interval, start=start, end=end,
+            prepost=True, rounding=rounding)
+
+        if history.empty:
+            return None
+
+        history = history.drop(columns=['Dividends', 'Stock Splits']).dropna()
+
+        # Truncates prepost data.
+        if re.match(r'[0-9]+[mh]$', interval):
+            history = history.loc[MarketCalendar.mask(history.index)]
+
+        return history
+
+
+class ReplaySource(Source):
+    """Replays histories from a local directory of Parquet or CSV files.
+
+    Histories are read from '{dir}/{interval}/{symbol}.parquet', falling back
+    to '.csv'. `period` is measured back from the last bar in the file rather
+    than from today, so replays are reproducible. '{n}d' periods keep the
+    last n sessions in the file.
+
+    Args:
+        dir (str): Directory holding the files.
+        tz (str): Time zone given to CSV timestamps.
+    """
+    CACHEABLE = False
+
+    def __init__(self, dir: str, tz='America/New_York'):
+        super().__init__()
+        self.dir = dir
+        self.tz = tz
+
+    def get_history(self, symbol: str, period: str, interval: str,
+                    start: str, end: str, rounding: int):
+        """Gets `symbol` price history from `dir`."""
+        path = f'{self.dir}/{interval}/{symbol}'
+        if os.path.exists(f'{path}.parquet'):
+            history = pd.read_parquet(f'{path}.parquet')
+        elif os.path.exists(f'{path}.csv'):
+            history = pd.read_csv(f'{path}.csv', index_col=0)
+            history.index = self._parse_index(history.index)
+        else:
+            return None
+
+        if history.empty:
+            return None
+
+        tz = history.index.tz
+        if start is not None:
+            history = history.loc[history.index >= utils.localize(start, tz)]
+        elif re.match(r'[0-9]+d$', period):
+            history = history.loc[MarketCalendar.last_sessions(
+                history.index, int(period[:-1]))]
+        else:
+            lo = utils.period2start(period, history.index[-1])
+            if lo is not None:
+                history = history.loc[history.index >= lo]
+        if end is not None:
+            history = history.loc[history.index < utils.localize(end, tz)]
+
+        if rounding:
+            history = history.round(rounding)
+
+        return history[['Open', 'High', 'Low', 'Close', 'Volume']]
+
+    def save(self, symbol: str, interval: str, history: pd.DataFrame):
+        """Writes `history` to '{dir}/{interval}/{symbol}.parquet'."""
+        os.makedirs(f'{self.dir}/{interval}', exist_ok=True)
+        history.to_parquet(f'{self.dir}/{interval}/{symbol}.parquet')
+
+    def _parse_index(self, index: pd.Index):
+        """Returns CSV timestamps as a pd.DatetimeIndex in `tz`."""
+        try:
+            parsed = pd.to_datetime(index)
+        except ValueError:
+            parsed = None
+        if not isinstance(parsed, pd.DatetimeIndex):
+            # Mixed UTC offsets, e.g. across daylight saving time.
+            return pd.to_datetime(index, utc=True).tz_convert(self.tz)
+        if parsed.tz is None:
+            return parsed.tz_localize(self.tz)
+        return parsed.tz_convert(self.tz)
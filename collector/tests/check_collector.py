@@ -12,7 +12,13 @@ Checks collector module.
 """
 
 
-from collector import Collector
+import asyncio
+import time
+
+import numpy as np
+import pandas as pd
+
+from collector import Collector, Source
 
 
 def check_parm_validation():
@@ -41,6 +47,151 @@ def check_get_history_yf():
     # print(f'--- {symbol} ---\n{history}\n')
 
 
+def check_get_history_cache():
+    symbol = 'AAPL'
+    Collector.invalidate(symbol)
+    for label in ['miss', 'hit']:
+        t0 = time.perf_counter()
+        history = Collector.get_history(symbol, period='max', interval='1d')
+        print(f'{label}: {len(history)} bars in '
+              f'{time.perf_counter() - t0:.3f}s')
+    uncached = Collector.get_history(
+        symbol, period='max', interval='1d', cache=False)
+    print(f'Cached history matches source: {history.equals(uncached)}\n')
+
+
+def check_cached_periods():
+    """Checks that '{n}d' periods served from the cache span the same
+    sessions as those pulled from the source."""
+    symbol = 'AAPL'
+    Collector.invalidate(symbol)
+    for interval in ['1d', '60m']:
+        Collector.get_history(symbol, period='60d', interval=interval)
+        for period in ['1d', '5d', '60d']:
+            cached = Collector.get_history(symbol, period, interval)
+            uncached = Collector.get_history(
+                symbol, period, interval, cache=False)
+            print(f'{period}/{interval}: {len(cached)} bars, cached history '
+                  f'matches source: {cached.equals(uncached)}')
+    print()
+
+
+def check_get_histories():
+    symbols = ['AAPL', 'MSFT', 'PLTR', 'CCL', 'U', 'V', 'FOO.BAR']
+    t0 = time.perf_counter()
+    histories, failures = Collector.get_histories(
+        symbols, period='1y', interval='1d', cache=False)
+    print(f'Fetched {len(histories)} histories in '
+          f'{time.perf_counter() - t0:.3f}s')
+    print(f'Failures: {failures}\n')
+
+
+def check_memo():
+    symbol = 'AAPL'
+    for _ in range(3):
+        Collector.get_history(symbol, period='1y', interval='1d')
+    print(f'Memo: {Collector.memo.stats()}\n')
+
+
+def check_resample():
+    symbol = 'AAPL'
+    Collector.invalidate(symbol)
+    for period, interval in [('max', '1mo'), ('1y', '1wk'), ('3mo', '1d')]:
+        t0 = time.perf_counter()
+        history = Collector.get_history(symbol, period, interval)
+        print(f'{period}/{interval}: {len(history)} bars in '
+              f'{time.perf_counter() - t0:.3f}s')
+    native = Collector.get_history(symbol, '1y', '1wk', cache=False)
+    resampled = Collector.get_history(symbol, '1y', '1wk')
+    print(f'--- {symbol} 1wk (native) ---\n{native.tail()}\n')
+    print(f'--- {symbol} 1wk (resampled) ---\n{resampled.tail()}\n')
+
+
+class FakeSource(Source):
+    """Serves the same synthetic history after a fixed `latency`."""
+    CACHEABLE = False
+
+    def __init__(self, latency: float):
+        super().__init__()
+        self.latency = latency
+        index = pd.date_range('2020-01-01', periods=252, freq='B')
+        prices = np.linspace(100, 120, len(index))
+        self.history = pd.DataFrame(
+            {'Open': prices, 'High': prices, 'Low': prices, 'Close': prices,
+             'Volume': 1_000}, index=index)
+
+    def get_history(self, symbol, period, interval, start, end, rounding):
+        time.sleep(self.latency)
+        return self.history.copy()
+
+
+def check_aget_histories_throughput(n=2000, latency=0.05):
+    """Measures fetch throughput against a fake source of fixed `latency`.
+
+    Synchronous fetches are capped by `workers` threads; async ones by
+    `max_in_flight`, so they overlap far more of the latency.
+    """
+    Collector.register_source('fake', FakeSource(latency))
+    symbols = [f'FAKE{i}' for i in range(n)]
+
+    t0 = time.perf_counter()
+    Collector.get_histories(symbols, period='1y', interval='1d', source='fake',
+                            cache=False)
+    elapsed = time.perf_counter() - t0
+    print(f'get_histories(workers={Collector.MAX_WORKERS}): '
+          f'{n / elapsed:.0f} symbols/s in {elapsed:.2f}s')
+
+    for max_in_flight in [Collector.MAX_WORKERS, Collector.MAX_IN_FLIGHT]:
+        t0 = time.perf_counter()
+        histories, failures = asyncio.run(Collector.aget_histories(
+            symbols, period='1y', interval='1d', source='fake', cache=False,
+            max_in_flight=max_in_flight))
+        elapsed = time.perf_counter() - t0
+        print(f'aget_histories(max_in_flight={max_in_flight}): '
+              f'{n / elapsed:.0f} symbols/s in {elapsed:.2f}s, '
+              f'{len(failures)} failures')
+    print()
+
+
+def check_replay_source():
+    symbol = 'AAPL'
+    history = Collector.get_history(symbol, period='max', interval='1d')
+    replay = Collector.sources['replay']
+    replay.save(symbol, '1d', history)
+    t0 = time.perf_counter()
+    replayed = Collector.get_history(
+        symbol, period='1y', interval='1d', source='replay')
+    print(f'Replayed {len(replayed)} bars in '
+          f'{time.perf_counter() - t0:.3f}s')
+    print(f'--- {symbol} (replay) ---\n{replayed}\n')
+
+
+def check_availability():
+    symbol = 'FOO.BAR'
+    Collector.invalidate(symbol)
+    for label in ['probe', 'probe again', 'known']:
+        t0 = time.perf_counter()
+        history = Collector.get_history(symbol, period='max', interval='1d')
+        print(f'{label}: {history} in {time.perf_counter() - t0:.3f}s')
+    print(f"Empty: {Collector.availability.empty(symbol, 'yfinance')}")
+    Collector.get_history('AAPL', period='1mo', interval='1d')
+    print(f"AAPL first 1d bar: "
+          f"{Collector.availability.first('AAPL', 'yfinance', '1d')}")
+    Collector.get_history('AAPL', period='max', interval='1d')
+    print(f"AAPL listed: {Collector.availability.listed('AAPL', 'yfinance')}")
+    periods = Collector.availability.periods(
+        'AAPL', 'yfinance', '1d', ['max', '10y', '1y'])
+    print(f'AAPL periods to try: {periods}\n')
+
+
 if __name__ == '__main__':
     check_parm_validation()
     check_get_history_yf()
+    check_get_history_cache()
+    check_cached_periods()
+    check_memo()
+    check_resample()
+    check_get_histories()
+    check_aget_histories_throughput()
+    check_replay_source()
+    check_availability()
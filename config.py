@@ -2,3 +2,7 @@ import os
 
 
 ASSETS_DIR = f'{os.path.dirname(__file__)}/assets'
+AVAILABILITY_DIR = f'{os.path.dirname(__file__)}/availability'
+CACHE_DIR = f'{os.path.dirname(__file__)}/cache'
+REPLAY_DIR = f'{os.path.dirname(__file__)}/replay'
+STATE_DIR = f'{os.path.dirname(__file__)}/state'
@@ -1 +1,3 @@
 from .indicators import *
+from .engine import *
+from .batch import *
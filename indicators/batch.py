@@ -0,0 +1,146 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""--- batch.py ---
+
+Computes indicators over many symbols at once.
+
+@author   Hank Adler
+@version  0.1.0
+@license  MIT
+
+--- Copyright (C) 2020 Hank Adler ---
+"""
+
+
+import numpy as np
+import pandas as pd
+
+from .engine import Bars, IndicatorEngine
+from .indicators import Indicators
+
+
+class BatchIndicators:
+    """Indicators over a (symbols x bars) array in one vectorized call.
+
+    Each symbol is a row whose bars are packed to the left, so ragged starts
+    and bars missing from some symbols never leak into another symbol's
+    windows. Values match those computed one symbol at a time.
+
+    Attributes:
+        BATCH_SIZE (int): Max number of symbols per array, which bounds
+            memory use on large universes.
+    """
+    BATCH_SIZE = 256
+
+    @classmethod
+    def RSI(cls, prices: any, window: int, smoothing='simple'):
+        """Calculates RSI(`window`) for every symbol in `prices`.
+
+        Parameters:
+            prices (np.ndarray|pd.DataFrame): Either a (symbols x bars) array
+                or a wide DataFrame with index=Datetime, columns=symbols. NaN
+                marks bars a symbol doesn't have, e.g. before its first quote.
+            window (int): Window size for rolling operations.
+            smoothing (str): See `Indicators.RSI`.
+
+        Returns:
+            np.ndarray|pd.DataFrame: Same type and shape as `prices`. Bars a
+            symbol doesn't have are NaN.
+        """
+        if isinstance(prices, pd.DataFrame):
+            rsi = cls.RSI(prices.to_numpy(dtype=np.float64).T, window,
+                          smoothing)
+            return pd.DataFrame(rsi.T, index=prices.index,
+                                columns=prices.columns)
+
+        values = np.asarray(prices, dtype=np.float64)
+        valid = ~np.isnan(values)
+        packed = cls._pack(values, valid)
+        rsi = Indicators.RSI(pd.DataFrame(packed.T), window, smoothing)
+        return cls._unpack(rsi.to_numpy().T, valid)
+
+    @classmethod
+    def compute(cls, histories: dict, indicators: list, **kwargs):
+        """Computes `indicators` over each of `histories`.
+
+        Parameters:
+            histories (dict): keys=symbols, values=pd.DataFrame as returned by
+                `Collector.get_history`. None values are skipped.
+            indicators (list): Names in `IndicatorEngine.registry`.
+            **kwargs: Indicator parameters. See `IndicatorEngine`.
+
+        Returns:
+            dict: keys=symbols, values=pd.DataFrame with index=Datetime,
+            columns=indicator columns.
+        """
+        unknown = [name for name in indicators
+                   if name not in IndicatorEngine.registry]
+        if unknown:
+            raise ValueError(f'indicators={unknown} are not valid! '
+                             f'Hint: {list(IndicatorEngine.registry)}')
+
+        histories = {symbol: history for symbol, history in histories.items()
+                     if history is not None}
+        if not indicators:
+            return {symbol: pd.DataFrame(index=history.index)
+                    for symbol, history in histories.items()}
+        # Batches symbols of similar lengths to keep padding down.
+        symbols = sorted(histories, key=lambda symbol: len(histories[symbol]))
+        computed = {}
+        for i in range(0, len(symbols), cls.BATCH_SIZE):
+            batch = [histories[symbol]
+                     for symbol in symbols[i:i + cls.BATCH_SIZE]]
+            columns = cls._compute(batch, indicators, **kwargs)
+            # One (columns x symbols x bars) block, sliced per symbol.
+            values = np.stack(list(columns.values()))
+            names = pd.Index(list(columns))
+            for j, symbol in enumerate(symbols[i:i + cls.BATCH_SIZE]):
+                n = len(histories[symbol])
+                computed[symbol] = pd.DataFrame(
+                    values[:, j, :n].T, index=histories[symbol].index,
+                    columns=names)
+        return computed
+
+    @classmethod
+    def _compute(cls, histories: list, indicators: list, **kwargs):
+        """Returns {column: (symbols x bars) array} for `histories`."""
+        lengths = np.array([len(history) for history in histories])
+        valid = np.arange(lengths.max(initial=0)) < lengths[:, None]
+
+        def stack(values: list, fill=np.nan):
+            array = np.full(valid.shape, fill)
+            array[valid] = np.concatenate(values)
+            return array
+
+        bars = Bars(*(stack([history[column].to_numpy(dtype=np.float64)
+                             for history in histories])
+                      for column in ['High', 'Low', 'Close', 'Volume']),
+                    stack([Bars.days(history.index) for history in histories],
+                          np.int64(-1)))
+
+        columns = {}
+        for name in indicators:
+            function, _, _, _ = IndicatorEngine.registry[name]
+            columns.update(function(
+                bars, **IndicatorEngine.params(name, **kwargs)))
+        return columns
+
+    @staticmethod
+    def _pack(values: np.ndarray, valid: np.ndarray):
+        """Returns `values` with each row's valid entries moved to the left."""
+        packed = np.full(values.shape, np.nan)
+        packed[np.arange(values.shape[-1]) < valid.sum(axis=-1)[:, None]] = (
+            values[valid])
+        return packed
+
+    @staticmethod
+    def _unpack(packed: np.ndarray, valid: np.ndarray):
+        """Returns `packed` entries moved back to the `valid` positions."""
+        values = np.full(packed.shape, np.nan)
+        values[valid] = packed[
+            np.arange(packed.shape[-1]) < valid.sum(axis=-1)[:, None]]
+        return values
+
+
+if __name__ == '__main__':
+    pass
@@ -0,0 +1,323 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""--- engine.py ---
+
+Computes sets of indicators over a price history in one pass.
+
+@author   Hank Adler
+@version  0.1.0
+@license  MIT
+
+--- Copyright (C) 2020 Hank Adler ---
+"""
+
+
+import functools
+
+import numpy as np
+import pandas as pd
+import scipy.signal
+
+from .indicators import Indicators
+
+
+class IndicatorEngine:
+    """Registry of NumPy-backed indicators.
+
+    Each indicator is a function of a `Bars` instance and its parameters that
+    returns {column: np.ndarray}. Requested indicators share one `Bars`, so
+    intermediates like true range or a given EMA are computed only once.
+
+    Parameters are passed as keyword arguments prefixed by the lowercased
+    indicator name, e.g. `sma_window=50` or `macd_fast=8`. RSI, which
+    predates the engine, takes them unprefixed, e.g. `window=60`.
+
+    Attributes:
+        registry (dict): Registered indicators by name. Values are
+            (function, columns, lookback, defaults) tuples.
+        prefixes (dict): Parameter prefix of each registered indicator.
+    """
+    registry = {}
+    prefixes = {}
+
+    @classmethod
+    def register(cls, name: str, columns: list, lookback=None, prefix=None,
+                 **defaults):
+        """Returns a decorator registering a function as indicator `name`.
+
+        The name is also added to `Indicators.INDICATORS`.
+
+        Parameters:
+            name (str): Indicator name, as given to `Stock(indicators=...)`.
+            columns (list): Columns the function returns.
+            lookback (callable): Takes the indicator parameters and returns
+                the number of prior bars each value depends on, or None if
+                values depend on the whole history. None when they always do
+                (e.g. EMA). Either forces a full recompute on refresh.
+            prefix (str): Prefix of the indicator parameters in keyword
+                arguments. Defaults to the lowercased name plus '_'.
+            **defaults: Indicator parameters and their default values.
+        """
+        def decorator(function):
+            cls.registry[name] = (function, columns, lookback, defaults)
+            cls.prefixes[name] = (f'{name.lower()}_' if prefix is None
+                                  else prefix)
+            if name not in Indicators.INDICATORS:
+                Indicators.INDICATORS.append(name)
+            return function
+        return decorator
+
+    @classmethod
+    def params(cls, name: str, **kwargs):
+        """Returns the parameters of `name` found in `kwargs` or defaulted."""
+        _, _, _, defaults = cls.registry[name]
+        prefix = cls.prefixes[name]
+        return {k: kwargs.get(prefix + k, v) for k, v in defaults.items()}
+
+    @classmethod
+    def lookback(cls, name: str, **kwargs):
+        """Returns the lookback of `name` or None if it has none."""
+        _, _, lookback, _ = cls.registry[name]
+        if lookback is None:
+            return None
+        return lookback(**cls.params(name, **kwargs))
+
+    @classmethod
+    def compute(cls, history: pd.DataFrame, indicators: list, **kwargs):
+        """Computes `indicators` over `history`.
+
+        Parameters:
+            history (pd.DataFrame): index=Datetime,
+                columns=Open|High|Low|Close|Volume
+            indicators (list): Registered indicator names.
+            **kwargs: Indicator parameters. See class docstring.
+
+        Returns:
+            pd.DataFrame: index=Datetime, columns=indicator columns
+        """
+        unknown = [name for name in indicators if name not in cls.registry]
+        if unknown:
+            raise ValueError(f'indicators={unknown} are not valid! '
+                             f'Hint: {list(cls.registry)}')
+
+        bars = Bars.from_history(history)
+        columns = {}
+        for name in indicators:
+            function, _, _, _ = cls.registry[name]
+            columns.update(function(bars, **cls.params(name, **kwargs)))
+        return pd.DataFrame(columns, index=history.index)
+
+
+class Bars:
+    """Contiguous float arrays of price bars plus memoized intermediates.
+
+    Arrays are 1-D for a single history, or 2-D with one row per symbol for
+    batches (see `BatchIndicators`). Either way every operation runs along
+    the last axis, so indicators are written once for both.
+
+    Args:
+        high, low, close, volume (np.ndarray): Bar values.
+        days (np.ndarray): Trading day of each bar, as returned by `days`.
+    """
+
+    def __init__(self, high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                 volume: np.ndarray, days: np.ndarray):
+        self.high = np.ascontiguousarray(high, dtype=np.float64)
+        self.low = np.ascontiguousarray(low, dtype=np.float64)
+        self.close = np.ascontiguousarray(close, dtype=np.float64)
+        self.volume = np.ascontiguousarray(volume, dtype=np.float64)
+        self.days = days
+        self._memo = {}
+
+    @classmethod
+    def from_history(cls, history: pd.DataFrame):
+        """Returns 1-D bars of `history`."""
+        return cls(history['High'], history['Low'], history['Close'],
+                   history['Volume'], cls.days(history.index))
+
+    @staticmethod
+    def days(index: pd.DatetimeIndex):
+        """Returns the local calendar day of each timestamp as an int64.
+
+        Cheaper than `index.normalize()` on tz-aware indexes.
+        """
+        return index.tz_localize(None).asi8 // 86_400_000_000_000
+
+    def __len__(self):
+        return self.close.shape[-1]
+
+    def _memoize(self, key: tuple, compute):
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
+
+    @functools.cached_property
+    def prev_close(self):
+        """Close of the previous bar. NaN on the first."""
+        return _shift(self.close)
+
+    @functools.cached_property
+    def true_range(self):
+        """True range. High - Low on the first bar, which has no previous
+        close."""
+        return np.fmax(self.high - self.low, np.maximum(
+            np.abs(self.high - self.prev_close),
+            np.abs(self.low - self.prev_close)))
+
+    @functools.cached_property
+    def typical(self):
+        """Typical price, (High + Low + Close) / 3."""
+        return (self.high + self.low + self.close) / 3
+
+    @functools.cached_property
+    def session_starts(self):
+        """Whether each bar is the first of its trading day."""
+        return self.days != _shift(self.days, -1)
+
+    def rolling_mean(self, name: str, window: int):
+        """Rolling mean of array `name` over `window` bars."""
+        return self._memoize(('mean', name, window), lambda: _rolling_sum(
+            getattr(self, name), window) / window)
+
+    def rolling_std(self, name: str, window: int):
+        """Rolling population standard deviation of array `name`."""
+        def compute():
+            x = getattr(self, name)
+            # Centering keeps the sum of squares from cancelling out.
+            center = x[..., :1]
+            x = x - center
+            x *= x
+            mean = self.rolling_mean(name, window) - center
+            var = _rolling_sum(x, window) / window - mean * mean
+            return np.sqrt(np.maximum(var, 0))
+        return self._memoize(('std', name, window), compute)
+
+    def ema(self, name: str, span: int):
+        """EMA of array `name`, seeded with its first value.
+
+        Same as `pd.Series.ewm(span=span, adjust=False).mean()`.
+        """
+        return self._memoize(('ema', name, span),
+                             lambda: _ema(getattr(self, name), span))
+
+    def wilder(self, name: str, window: int):
+        """Wilder's running average of array `name`. See `Indicators.RSI`."""
+        return self._memoize(('wilder', name, window),
+                             lambda: Indicators._wilder(getattr(self, name),
+                                                        window))
+
+
+def _shift(x: np.ndarray, fill=np.nan):
+    """Returns `x` shifted one bar later, `fill` taking the first place."""
+    first = np.full(x.shape[:-1] + (1,), fill, dtype=np.result_type(x, fill))
+    return np.concatenate((first, x[..., :-1]), axis=-1)
+
+
+def _rolling_sum(x: np.ndarray, window: int):
+    """Returns the sum of each `window` values of `x`, NaN-padded on the left.
+
+    Takes linear time whatever the window. Cumulative sums restart every
+    `window` values, so a window is the rest of one block plus a prefix of
+    the next, and rounding errors stay those of a single window rather than
+    growing with the length of `x`.
+    """
+    n = x.shape[-1]
+    if n < window:
+        return np.full(x.shape, np.nan)
+    blocks = -(-n // window)
+    padded = np.empty(x.shape[:-1] + (blocks * window,))
+    padded[..., :n] = x
+    padded[..., n:] = 0
+    prefix = np.cumsum(
+        padded.reshape(x.shape[:-1] + (blocks, window)), axis=-1)
+    # Windows ending mid-block add what's left of the block before. Those
+    # ending on a block's last value are that block alone.
+    prefix[..., 1:, :-1] += (prefix[..., :-1, -1:]
+                             - prefix[..., :-1, :-1])
+    sums = prefix.reshape(x.shape[:-1] + (-1,))[..., :n]
+    sums[..., :window - 1] = np.nan
+    return sums
+
+
+def _ema(x: np.ndarray, span: int):
+    """Returns the EMA of `x` seeded with its first value."""
+    if not x.shape[-1]:
+        return np.empty(x.shape)
+    alpha = 2 / (span + 1)
+    ema, _ = scipy.signal.lfilter([alpha], [1, alpha - 1], x,
+                                  zi=(1 - alpha) * x[..., :1])
+    return ema
+
+
+@IndicatorEngine.register(
+    'RSI', ['RSI'],
+    lambda window, smoothing: int(window) if smoothing == 'simple' else None,
+    prefix='', window=60, smoothing='simple')
+def _rsi(bars: Bars, window: int, smoothing: str):
+    """See `Indicators.RSI`. Runs on lows, like the statistics built on it."""
+    low = bars.low
+    if low.ndim == 1:
+        return {'RSI': Indicators.RSI(pd.Series(low), int(window),
+                                      smoothing).to_numpy()}
+    return {'RSI': Indicators.RSI(pd.DataFrame(low.T), int(window),
+                                  smoothing).to_numpy().T}
+
+
+@IndicatorEngine.register('SMA', ['SMA'], lambda window: window - 1,
+                          window=20)
+def _sma(bars: Bars, window: int):
+    return {'SMA': bars.rolling_mean('close', window)}
+
+
+@IndicatorEngine.register('EMA', ['EMA'], span=20)
+def _ema_indicator(bars: Bars, span: int):
+    return {'EMA': bars.ema('close', span)}
+
+
+@IndicatorEngine.register('MACD', ['MACD', 'MACD_Signal', 'MACD_Hist'],
+                          fast=12, slow=26, signal=9)
+def _macd(bars: Bars, fast: int, slow: int, signal: int):
+    macd = bars.ema('close', fast) - bars.ema('close', slow)
+    signal_line = _ema(macd, signal)
+    return {'MACD': macd, 'MACD_Signal': signal_line,
+            'MACD_Hist': macd - signal_line}
+
+
+@IndicatorEngine.register('BBANDS', ['BB_Upper', 'BB_Middle', 'BB_Lower'],
+                          lambda window, k: window - 1, window=20, k=2)
+def _bbands(bars: Bars, window: int, k: float):
+    middle = bars.rolling_mean('close', window)
+    width = k * bars.rolling_std('close', window)
+    return {'BB_Upper': middle + width, 'BB_Middle': middle,
+            'BB_Lower': middle - width}
+
+
+@IndicatorEngine.register('ATR', ['ATR'], window=14)
+def _atr(bars: Bars, window: int):
+    return {'ATR': bars.wilder('true_range', window)}
+
+
+@IndicatorEngine.register('VWAP', ['VWAP'])
+def _vwap(bars: Bars):
+    """Volume-weighted average price, anchored at each session's open."""
+    pv = np.cumsum(bars.typical * bars.volume, axis=-1)
+    volume = np.cumsum(bars.volume, axis=-1)
+    # Subtracts the running totals at the end of the previous session.
+    positions = np.where(bars.session_starts, np.arange(len(bars)), 0)
+    starts = np.maximum.accumulate(positions, axis=-1)
+    pv -= np.take_along_axis(_shift(pv, 0.0), starts, axis=-1)
+    volume -= np.take_along_axis(_shift(volume, 0.0), starts, axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return {'VWAP': pv / volume}
+
+
+@IndicatorEngine.register('OBV', ['OBV'])
+def _obv(bars: Bars):
+    """On-balance volume, starting at 0."""
+    direction = np.sign(bars.close - bars.prev_close)
+    direction[..., :1] = 0
+    return {'OBV': np.cumsum(direction * bars.volume, axis=-1)}
+
+
+if __name__ == '__main__':
+    pass
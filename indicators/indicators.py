@@ -12,23 +12,38 @@ Relative Strength Index.
 """
 
 
+import math
+
+import numpy as np
 import pandas as pd
+import scipy.signal
 
 
 class Indicators:
-    INDICATORS = ['RSI']
+    # Names of the indicators in `IndicatorEngine.registry`, kept by
+    # `IndicatorEngine.register`.
+    INDICATORS = []
+    SMOOTHINGS = ['simple', 'wilder']
 
     @staticmethod
-    def RSI(prices: pd.Series, window: int):
+    def RSI(prices: pd.Series, window: int, smoothing='simple'):
         """Calculates RSI(`window`) on `prices`.
 
         Parameters:
-            prices (pd.Series): Stock price history.
+            prices (pd.Series): Stock price history. A pd.DataFrame with one
+                column per symbol works too. See `BatchIndicators.RSI`.
             window (int): Window size for rolling operations.
+            smoothing (str): 'simple' averages gains and losses over rolling
+                windows; 'wilder' uses Wilder's running averages, seeded with
+                the simple average of the first `window` changes.
 
         Returns:
             pd.Series: index=Datetime, columns=RSI
         """
+        if smoothing not in Indicators.SMOOTHINGS:
+            raise ValueError(f'smoothing={smoothing} is not valid! '
+                             f'Hint: {Indicators.SMOOTHINGS}')
+
         changes = prices.pct_change()
 
         gains = changes.copy()
@@ -37,11 +52,194 @@ class Indicators:
         losses = abs(changes.copy())
         losses[changes > 0] = 0.0
 
-        avg_gain = gains.rolling(window).mean()
-        avg_loss = losses.rolling(window).mean()
+        if smoothing == 'simple':
+            avg_gain = gains.rolling(window).mean()
+            avg_loss = losses.rolling(window).mean()
+        else:
+            # `_wilder` runs along the last axis, i.e. across bars.
+            avg_gain = gains.copy()
+            avg_gain[:] = Indicators._wilder(gains.to_numpy().T, window).T
+            avg_loss = losses.copy()
+            avg_loss[:] = Indicators._wilder(losses.to_numpy().T, window).T
 
         return (100 - 100 / (1 + avg_gain / avg_loss)).__round__(2)
 
+    @staticmethod
+    def _wilder(x: np.ndarray, window: int):
+        """Returns Wilder's running average of `x` along its last axis.
+
+        `x` starts with a NaN, as returned by `pct_change`.
+        """
+        average = np.full(x.shape, np.nan)
+        if x.shape[-1] > window:
+            # Sums left to right, the same way `StreamingRSI` does.
+            seed = np.cumsum(x[..., 1:window + 1], axis=-1)[..., -1] / window
+            average[..., window] = seed
+            alpha = 1 / window
+            average[..., window + 1:], _ = scipy.signal.lfilter(
+                [alpha], [1, -(1 - alpha)], x[..., window + 1:],
+                zi=(1 - alpha) * seed[..., None])
+        return average
+
+
+class StreamingRSI:
+    """RSI calculator that takes one price at a time.
+
+    Each `update` runs in constant time and memory: the simple variant keeps
+    the last `window` gains and losses in fixed-size ring buffers, and the
+    Wilder variant keeps only running averages. Fed the same prices, values
+    match `Indicators.RSI`.
+
+    Args:
+        window (int): Window size.
+        smoothing (str): See `Indicators.RSI`.
+        prices (iterable): Prices to seed the calculator with.
+
+    Attributes:
+        value (float): RSI after the last update. NaN until `window` changes
+            have been seen.
+    """
+
+    def __init__(self, window: int, smoothing='simple', prices=()):
+        if smoothing not in Indicators.SMOOTHINGS:
+            raise ValueError(f'smoothing={smoothing} is not valid! '
+                             f'Hint: {Indicators.SMOOTHINGS}')
+        self.window = window
+        self.smoothing = smoothing
+        self.value = math.nan
+        self._price = math.nan
+        self._count = 0
+        if smoothing == 'simple':
+            self._gains = _RollingMean(window)
+            self._losses = _RollingMean(window)
+        else:
+            self._alpha = 1 / window
+            self._avg_gain = 0.0
+            self._avg_loss = 0.0
+        self.seed(prices)
+
+    def seed(self, prices):
+        """Feeds `prices` in order and returns the last value."""
+        for price in prices:
+            self.update(price)
+        return self.value
+
+    def update(self, price: float):
+        """Feeds the next price and returns the current RSI."""
+        price = float(price)
+        if self._price == 0:
+            # Follows NumPy division, as `pct_change` does.
+            change = math.nan if price == 0 else math.inf
+        else:
+            change = price / self._price - 1
+        self._price = price
+        if change != change:
+            gain = loss = math.nan
+        elif change > 0:
+            gain, loss = change, 0.0
+        else:
+            gain, loss = 0.0, abs(change)
+
+        if self.smoothing == 'simple':
+            avg_gain = self._gains.update(gain)
+            avg_loss = self._losses.update(loss)
+        else:
+            avg_gain, avg_loss = self._update_wilder(gain, loss)
+
+        self.value = self._rsi(avg_gain, avg_loss)
+        return self.value
+
+    def _update_wilder(self, gain: float, loss: float):
+        """Returns Wilder's running averages after adding `gain`/`loss`."""
+        if gain != gain:
+            return math.nan, math.nan
+        self._count += 1
+        if self._count < self.window:
+            self._avg_gain += gain
+            self._avg_loss += loss
+            return math.nan, math.nan
+        if self._count == self.window:
+            self._avg_gain = (self._avg_gain + gain) / self.window
+            self._avg_loss = (self._avg_loss + loss) / self.window
+        else:
+            alpha = self._alpha
+            self._avg_gain = alpha * gain + (1 - alpha) * self._avg_gain
+            self._avg_loss = alpha * loss + (1 - alpha) * self._avg_loss
+        return self._avg_gain, self._avg_loss
+
+    @staticmethod
+    def _rsi(avg_gain: float, avg_loss: float):
+        """Returns RSI computed and rounded the way `Indicators.RSI` does."""
+        if avg_loss == 0:
+            # Follows NumPy division: x / 0 is inf and 0 / 0 is NaN.
+            rsi = 100.0 if avg_gain > 0 else math.nan
+        else:
+            rsi = 100 - 100 / (1 + avg_gain / avg_loss)
+        if rsi != rsi:
+            return rsi
+        # Same as np.round(rsi, 2).
+        return round(rsi * 100) / 100
+
+
+class _RollingMean:
+    """Rolling mean over a fixed-size ring buffer.
+
+    Mirrors the Kahan-compensated running sum `pd.Series.rolling().mean()`
+    uses, so results are identical to it.
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self._values = [math.nan] * window
+        self._i = 0
+        self._nobs = 0
+        self._neg_ct = 0
+        self._sum = 0.0
+        self._compensation_add = 0.0
+        self._compensation_remove = 0.0
+        self._same_ct = 0
+        self._previous = math.nan
+
+    def update(self, value: float):
+        """Adds `value`, dropping the oldest one, and returns the mean."""
+        old = self._values[self._i]
+        self._values[self._i] = value
+        self._i = (self._i + 1) % self.window
+
+        if old == old:
+            self._nobs -= 1
+            y = -old - self._compensation_remove
+            t = self._sum + y
+            self._compensation_remove = t - self._sum - y
+            self._sum = t
+            if math.copysign(1, old) < 0:
+                self._neg_ct -= 1
+
+        if value == value:
+            self._nobs += 1
+            y = value - self._compensation_add
+            t = self._sum + y
+            self._compensation_add = t - self._sum - y
+            self._sum = t
+            if math.copysign(1, value) < 0:
+                self._neg_ct += 1
+            if value == self._previous:
+                self._same_ct += 1
+            else:
+                self._same_ct = 1
+            self._previous = value
+
+        if self._nobs < self.window:
+            return math.nan
+        mean = self._sum / self._nobs
+        if self._same_ct >= self._nobs:
+            mean = self._previous
+        elif self._neg_ct == 0 and mean < 0:
+            mean = 0.0
+        elif self._neg_ct == self._nobs and mean > 0:
+            mean = 0.0
+        return mean
+
 
 if __name__ == '__main__':
     pass
@@ -12,8 +12,14 @@ Checks indicators_remaining module.
 """
 
 
+import time
+
+import numpy as np
+import pandas as pd
+
 from collector import Collector
-from indicators import Indicators
+from indicators import (Bars, BatchIndicators, IndicatorEngine, Indicators,
+                        StreamingRSI)
 
 
 def main():
@@ -22,5 +28,85 @@ def main():
     print(rsi)
 
 
+def check_streaming_rsi():
+    history = Collector.get_history('AAPL', period='5d', interval='1m')
+    prices = history['Low']
+    for smoothing in Indicators.SMOOTHINGS:
+        expected = Indicators.RSI(prices, 60, smoothing=smoothing)
+        calculator = StreamingRSI(60, smoothing, prices=prices[:-100])
+        t0 = time.perf_counter()
+        values = [calculator.update(price) for price in prices[-100:]]
+        elapsed = (time.perf_counter() - t0) / 100
+        print(f'{smoothing}: matches Indicators.RSI = '
+              f'{expected[-100:].tolist() == values}, '
+              f'{elapsed * 1e6:.1f} us/tick')
+
+
+def check_engine():
+    history = Collector.get_history('AAPL', period='5d', interval='1m')
+    t0 = time.perf_counter()
+    values = IndicatorEngine.compute(history, list(IndicatorEngine.registry))
+    elapsed = time.perf_counter() - t0
+    print(values.tail())
+    print(f'{len(IndicatorEngine.registry)} indicators over {len(history)} '
+          f'bars in {elapsed * 1e3:.1f} ms')
+
+    close = history['Close']
+    expected = {
+        'SMA': close.rolling(20).mean(),
+        'EMA': close.ewm(span=20, adjust=False).mean(),
+        'BB_Middle': close.rolling(20).mean(),
+    }
+    for column, series in expected.items():
+        print(f'{column} matches pandas = '
+              f'{((values[column] - series).abs() < 1e-9).sum() == series.count()}')
+
+
+def check_rolling(symbols=256, bars=20_000):
+    """Times BBANDS(20) and SMA(200) window math against pandas `rolling`."""
+    close = 100 + np.random.default_rng(0).standard_normal(
+        (symbols, bars)).cumsum(axis=-1)
+    days = np.zeros(bars, dtype=np.int64)
+    frame = pd.DataFrame(close.T)
+    for label, window, function, expected in [
+            ('BBANDS(20)', 20,
+             lambda b: (b.rolling_mean('close', 20),
+                        b.rolling_std('close', 20)),
+             lambda: (frame.rolling(20).mean(),
+                      frame.rolling(20).std(ddof=0))),
+            ('SMA(200)', 200, lambda b: (b.rolling_mean('close', 200),),
+             lambda: (frame.rolling(200).mean(),))]:
+        t0 = time.perf_counter()
+        values = function(Bars(close, close, close, close, days))
+        t1 = time.perf_counter()
+        frames = expected()
+        t2 = time.perf_counter()
+        error = max(np.nanmax(np.abs(v - f.to_numpy().T))
+                    for v, f in zip(values, frames))
+        print(f'{label}: {t1 - t0:.2f}s (pandas {t2 - t1:.2f}s), '
+              f'max diff from pandas {error:.1e}')
+
+
+def check_batch():
+    symbols = ['AAPL', 'MSFT', 'AI', 'PLTR', 'CCL', 'U', 'V']
+    histories, _ = Collector.get_histories(symbols, period='5d', interval='1m')
+    wide = pd.concat({symbol: history['Low']
+                      for symbol, history in histories.items()}, axis=1)
+    t0 = time.perf_counter()
+    rsi = BatchIndicators.RSI(wide, 60)
+    elapsed = time.perf_counter() - t0
+    print(rsi.tail())
+    print(f'{wide.shape[1]} symbols x {wide.shape[0]} bars in '
+          f'{elapsed * 1e3:.1f} ms')
+    for symbol, history in histories.items():
+        expected = Indicators.RSI(history['Low'], 60)
+        print(f'{symbol} matches Indicators.RSI = '
+              f'{rsi[symbol].reindex(history.index).equals(expected)}')
+
+
 if __name__ == '__main__':
     main()
+    check_streaming_rsi()
+    check_engine()
+    check_rolling()
+    check_batch()
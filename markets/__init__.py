@@ -0,0 +1 @@
+from .markets import *
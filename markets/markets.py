@@ -0,0 +1,284 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""--- markets.py ---
+
+Trading calendar of the New York Stock Exchange.
+
+@author   Hank Adler
+@version  0.1.0
+@license  MIT
+
+--- Copyright (C) 2020 Hank Adler ---
+"""
+
+
+import datetime as dt
+import functools
+import re
+
+import numpy as np
+import pandas as pd
+
+import utils
+
+
+class MarketCalendar:
+    """NYSE holidays, early closes and regular session hours.
+
+    Days are int64 day numbers (days since 1970-01-01) and times are int64
+    wall-clock nanoseconds in `TZ`, as held by `Sessions`, so every lookup is
+    an array operation over whole histories.
+
+    Attributes:
+        DAY (int): Nanoseconds in a day.
+        TZ (str): Exchange time zone.
+        OPEN, CLOSE, EARLY_CLOSE (int): Session open, regular close and early
+            close, as nanoseconds since midnight.
+        CLOSURES (list): Unscheduled full-day closures, e.g. national days of
+            mourning.
+    """
+    DAY = 86_400_000_000_000
+    TZ = 'America/New_York'
+    OPEN = pd.Timedelta(hours=9, minutes=30).value
+    CLOSE = pd.Timedelta(hours=16).value
+    EARLY_CLOSE = pd.Timedelta(hours=13).value
+    CLOSURES = ['2001-09-11', '2001-09-12', '2001-09-13', '2001-09-14',
+                '2004-06-11', '2007-01-02', '2012-10-29', '2012-10-30',
+                '2018-12-05', '2025-01-09']
+
+    @classmethod
+    def holidays(cls, start, end):
+        """Returns the dates the market is closed on weekdays between `start`
+        and `end`, both inclusive, as a pd.DatetimeIndex."""
+        days = cls._days(start, end)
+        return pd.to_datetime(days[cls.closed(days) & (cls._weekday(days) < 5)]
+                              * cls.DAY)
+
+    @classmethod
+    def early_closes(cls, start, end):
+        """Returns the dates of early closes between `start` and `end`, both
+        inclusive, as a pd.DatetimeIndex."""
+        days = cls._days(start, end)
+        return pd.to_datetime(days[cls.early(days)] * cls.DAY)
+
+    @classmethod
+    def closed(cls, days: np.ndarray):
+        """Returns whether the market is closed on each of `days`."""
+        days = np.asarray(days, dtype=np.int64)
+        holidays, _ = cls._lookup(days)
+        return (cls._weekday(days) >= 5) | np.isin(days, holidays)
+
+    @classmethod
+    def early(cls, days: np.ndarray):
+        """Returns whether each of `days` closes at `EARLY_CLOSE`."""
+        days = np.asarray(days, dtype=np.int64)
+        _, early_closes = cls._lookup(days)
+        return np.isin(days, early_closes)
+
+    @classmethod
+    def bounds(cls, days: np.ndarray):
+        """Returns (opens, closes), the session bounds of each of `days` as
+        wall-clock nanoseconds.
+
+        Closed days get a close before their open, so no time falls within
+        them.
+        """
+        days = np.asarray(days, dtype=np.int64)
+        opens = days * cls.DAY + cls.OPEN
+        closes = days * cls.DAY + np.where(cls.early(days), cls.EARLY_CLOSE,
+                                           cls.CLOSE)
+        closed = cls.closed(days)
+        closes[closed] = opens[closed] - 1
+        return opens, closes
+
+    @classmethod
+    def mask(cls, times: any):
+        """Returns whether each of `times` falls within its day's session.
+
+        Both session bounds are inclusive, so bars stamped at the close are
+        kept.
+
+        Parameters:
+            times (pd.DatetimeIndex|np.ndarray): Timestamps, or wall-clock
+                nanoseconds as returned by `wall`.
+        """
+        wall = cls.wall(times)
+        opens, closes = cls.bounds(wall // cls.DAY)
+        return (wall >= opens) & (wall <= closes)
+
+    @classmethod
+    def expected_bars(cls, days: np.ndarray, interval: str):
+        """Returns the number of `interval` bars in each of `days` sessions.
+
+        Intraday counts include the bar stamped at the close, as `mask`
+        keeps it. Daily and longer intervals count 1 per open day.
+        """
+        days = np.asarray(days, dtype=np.int64)
+        if not re.match(r'[0-9]+[mh]$', interval):
+            return (~cls.closed(days)).astype(np.int64)
+        step = utils.interval2timedelta(interval).value
+        opens, closes = cls.bounds(days)
+        return np.maximum((closes - opens) // step + 1, 0)
+
+    @classmethod
+    def session_start(cls, n: int, now: pd.Timestamp):
+        """Returns the midnight starting the `n`-th last session up to `now`,
+        in the time zone of `now`.
+
+        Today's session counts once it has opened.
+        """
+        wall = cls.wall(pd.DatetimeIndex([now]))[0]
+        today = wall // cls.DAY
+        # Over 2 in 3 days are sessions, so 2n days plus slack hold n.
+        days = np.arange(today - 2 * n - 14, today + 1, dtype=np.int64)
+        days = days[~cls.closed(days)]
+        if wall < today * cls.DAY + cls.OPEN:
+            days = days[days < today]
+        start = pd.Timestamp(days[-n] * cls.DAY)
+        if now.tz is None:
+            return start
+        return start.tz_localize(cls.TZ).tz_convert(now.tz)
+
+    @classmethod
+    def period_start(cls, period: str, now: pd.Timestamp):
+        """Returns the timestamp `period` reaches back to from `now`, or None
+        for 'max'.
+
+        '{n}d' periods count sessions, see `session_start`. Others count
+        calendar time, see `utils.period2start`.
+        """
+        match = re.match(r'([0-9]+)d$', period)
+        if match is not None:
+            return cls.session_start(int(match.group(1)), now)
+        return utils.period2start(period, now)
+
+    @classmethod
+    def sessions_between(cls, start: pd.Timestamp, end: pd.Timestamp):
+        """Returns the number of sessions on the days from `start` up to, but
+        not including, the day of `end`."""
+        first, last = cls.wall(pd.DatetimeIndex([start, end])) // cls.DAY
+        days = np.arange(first, last, dtype=np.int64)
+        return int((~cls.closed(days)).sum())
+
+    @classmethod
+    def last_sessions(cls, times: any, n: int):
+        """Returns whether each of `times` falls on one of the last `n` days
+        found in `times`.
+
+        Parameters:
+            times (pd.DatetimeIndex|np.ndarray): Sorted timestamps, or
+                wall-clock nanoseconds as returned by `wall`.
+        """
+        days = cls.wall(times) // cls.DAY
+        if len(days) == 0:
+            return np.zeros(0, dtype=bool)
+        starts = np.flatnonzero(np.diff(days, prepend=days[0] - 1))
+        return np.arange(len(days)) >= starts[max(len(starts) - n, 0)]
+
+    @classmethod
+    def wall(cls, times: any):
+        """Returns `times` as wall-clock nanoseconds in `TZ`.
+
+        Naive timestamps are taken to be in `TZ` already. Arrays are returned
+        as they are.
+        """
+        if not isinstance(times, pd.DatetimeIndex):
+            return np.asarray(times, dtype=np.int64)
+        if times.tz is not None and str(times.tz) != cls.TZ:
+            times = times.tz_convert(cls.TZ)
+        return times.tz_localize(None).asi8
+
+    @classmethod
+    def _lookup(cls, days: np.ndarray):
+        """Returns (holidays, early closes) of the years `days` span."""
+        if not len(days):
+            return np.empty(0, np.int64), np.empty(0, np.int64)
+        first = pd.Timestamp(days.min() * cls.DAY).year
+        last = pd.Timestamp(days.max() * cls.DAY).year
+        years = [cls._year(year) for year in range(first, last + 1)]
+        return (np.concatenate([holidays for holidays, _ in years]),
+                np.concatenate([early_closes for _, early_closes in years]))
+
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def _year(cls, year: int):
+        """Returns (holidays, early closes) of `year` as day numbers."""
+        def nth(month, weekday, n):
+            """Date of the `n`th `weekday` of `month`, counting from the end
+            if `n` is negative."""
+            if n > 0:
+                first = dt.date(year, month, 1)
+                return first + dt.timedelta(
+                    (weekday - first.weekday()) % 7 + 7 * (n - 1))
+            last = (dt.date(year + month // 12, month % 12 + 1, 1)
+                    - dt.timedelta(1))
+            return last - dt.timedelta(
+                (last.weekday() - weekday) % 7 - 7 * (n + 1))
+
+        def observed(date):
+            """`date` moved off weekends, Saturdays to Fridays and Sundays to
+            Mondays."""
+            if date.weekday() == 5:
+                return date - dt.timedelta(1)
+            if date.weekday() == 6:
+                return date + dt.timedelta(1)
+            return date
+
+        holidays = [nth(2, 0, 3),                   # Washington's Birthday
+                    cls._easter(year) - dt.timedelta(2),  # Good Friday
+                    nth(5, 0, -1),                  # Memorial Day
+                    observed(dt.date(year, 7, 4)),  # Independence Day
+                    nth(9, 0, 1),                   # Labor Day
+                    nth(11, 3, 4),                  # Thanksgiving
+                    observed(dt.date(year, 12, 25))]
+        # Not moved to the previous Friday, which closes the year.
+        if dt.date(year, 1, 1).weekday() != 5:
+            holidays.append(observed(dt.date(year, 1, 1)))
+        if year >= 1998:
+            holidays.append(nth(1, 0, 3))           # Martin Luther King Jr.
+        if year >= 2022:
+            holidays.append(observed(dt.date(year, 6, 19)))  # Juneteenth
+        holidays += [date for date in map(dt.date.fromisoformat,
+                                          cls.CLOSURES) if date.year == year]
+
+        early_closes = [nth(11, 3, 4) + dt.timedelta(1)]
+        for date in [dt.date(year, 7, 3), dt.date(year, 12, 24)]:
+            if date.weekday() < 5 and date not in holidays:
+                early_closes.append(date)
+
+        epoch = dt.date(1970, 1, 1)
+        return (np.array(sorted((date - epoch).days for date in holidays),
+                         dtype=np.int64),
+                np.array(sorted((date - epoch).days for date in early_closes),
+                         dtype=np.int64))
+
+    @staticmethod
+    def _easter(year: int):
+        """Returns the date of Easter Sunday (anonymous Gregorian algorithm)."""
+        a, b, c = year % 19, year // 100, year % 100
+        d, e = divmod(b, 4)
+        f = (b + 8) // 25
+        g = (b - f + 1) // 3
+        h = (19 * a + b - d - g + 15) % 30
+        i, k = divmod(c, 4)
+        l = (32 + 2 * e + 2 * i - h - k) % 7
+        m = (a + 11 * h + 22 * l) // 451
+        month, day = divmod(h + l - 7 * m + 114, 31)
+        return dt.date(year, month, day + 1)
+
+    @classmethod
+    def _days(cls, start, end):
+        """Returns the day numbers from `start` to `end`, both inclusive."""
+        first = pd.Timestamp(start).value // cls.DAY
+        last = pd.Timestamp(end).value // cls.DAY
+        return np.arange(first, last + 1, dtype=np.int64)
+
+    @staticmethod
+    def _weekday(days: np.ndarray):
+        """Returns the weekday of each of `days`, Monday being 0."""
+        # 1970-01-01 was a Thursday.
+        return (days + 3) % 7
+
+
+if __name__ == '__main__':
+    pass
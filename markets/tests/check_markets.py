@@ -0,0 +1,45 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""--- check_markets.py ---
+
+Checks markets module.
+
+@author   Hank Adler
+@version  0.1.0
+@license  MIT
+
+--- Copyright (C) 2020 Hank Adler ---
+"""
+
+
+import pandas as pd
+
+from markets import MarketCalendar
+
+
+def check_holidays():
+    print(f'--- check_holidays() ---')
+    print(f"Holidays: {MarketCalendar.holidays('2024-01-01', '2024-12-31')}")
+    print(f"Early closes: "
+          f"{MarketCalendar.early_closes('2024-01-01', '2024-12-31')}")
+
+
+def check_mask():
+    print(f'--- check_mask() ---')
+    index = pd.date_range('2024-07-03 9:00', '2024-07-05 17:00', freq='30min',
+                          tz=MarketCalendar.TZ)
+    print(index[MarketCalendar.mask(index)])
+
+
+def check_expected_bars():
+    print(f'--- check_expected_bars() ---')
+    days = MarketCalendar.wall(pd.DatetimeIndex(
+        ['2024-07-03', '2024-07-04', '2024-07-05'])) // MarketCalendar.DAY
+    for interval in ['1m', '5m', '60m', '1d']:
+        print(f'{interval}: {MarketCalendar.expected_bars(days, interval)}')
+
+
+if __name__ == '__main__':
+    check_holidays()
+    check_mask()
+    check_expected_bars()
@@ -13,6 +13,7 @@ Contains Plotter class definition.
 
 
 import matplotlib.pyplot as plt
+import pandas as pd
 
 from stocks import Stock
 
@@ -41,7 +42,9 @@ class Plotter:
         rsi_ax.text(
             h['RSI'][-1] * 1.005, y_mid, f'{h["RSI"][-1]}', rotation=90)
 
-        open_vols = h.groupby(h.index.date)['Volume'].first()
+        sessions = stock.sessions
+        open_vols = pd.Series(h['Volume'].to_numpy()[sessions.starts],
+                              index=sessions.dates)
         norm_open_vols = (open_vols / open_vols.max()).round(2)
         vol_ax = norm_open_vols.plot.kde(ax=axs[2])
         vol_ax.set_xlim(left=0, right=1)
@@ -1 +1,5 @@
+from .metrics import *
+from .criteria import *
+from .state import *
 from .screens import *
+from .pipeline import *
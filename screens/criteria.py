@@ -0,0 +1,164 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""--- criteria.py ---
+
+Screening criteria compiled from declarative specs.
+
+@author   Hank Adler
+@version  0.1.0
+@license  MIT
+
+--- Copyright (C) 2020 Hank Adler ---
+"""
+
+
+import json
+import math
+import re
+
+import numpy as np
+import pandas as pd
+
+import utils
+from .metrics import Metrics
+
+
+class Criteria:
+    """Screening criteria compiled from a spec.
+
+    A spec is a dict, or a JSON file holding one, with fields:
+        name (str): Name of the criteria.
+        description (str): Optional. Defaults to a list of the rules.
+        criteria (list): dicts with fields:
+            metric (str): Name of a metric, see `Metrics.registry`.
+            rule (str): Comparison and threshold, e.g. '> 0'. A threshold
+                that isn't a number names a keyword argument of
+                `Screener.screen`, e.g. '<= max_age'.
+            period (str): Period of the history. See `Collector.get_history`.
+            interval (str): Interval of the history.
+            name (str): Optional. Defaults to 'Criterion_<n>'.
+            stat (str): Optional column of the metric in `Screener.stats`.
+                Defaults to `metric`.
+            params (dict): Optional keyword arguments of the metric.
+            round (int): Optional decimals of the stat in `Screener.stats`.
+            cost (float): Optional cost of fetching the history, in bars
+                per session. Defaults to that of `interval`, see `cost`.
+                Cheaper histories are checked first.
+
+    Criteria sharing a history are judged together as one check.
+
+    Args:
+        spec (dict): See above.
+
+    Attributes:
+        OPERATORS (dict): keys=comparisons, values=NumPy ufuncs.
+        name (str): Name of the criteria.
+        description (str): Description of the criteria.
+        rules (list): (criterion, stat, operator, threshold) tuples.
+        checks (list): (period, interval, cost, measures) tuples, cheapest
+            first, where measures holds (stat, metric, params) tuples.
+        stats (list): Stats in order of appearance.
+        decimals (dict): keys=stats, values=decimals to round to.
+    """
+    OPERATORS = {'>': np.greater, '>=': np.greater_equal, '<': np.less,
+                 '<=': np.less_equal, '==': np.equal, '!=': np.not_equal}
+
+    def __init__(self, spec: dict):
+        self.name = spec['name']
+        self.rules = []
+        self.decimals = {}
+        checks = {}
+        costs = {}
+        measures = {}
+        for i, criterion in enumerate(spec['criteria'], 1):
+            metric = criterion['metric']
+            if metric not in Metrics.registry:
+                raise ValueError(f'metric={metric} is not valid! Hint: '
+                                 f'metric in {list(Metrics.registry)}')
+            stat = criterion.get('stat', metric)
+            key = (criterion['period'], criterion['interval'])
+            operator, threshold = self._parse(criterion['rule'])
+            self.rules.append((criterion.get('name', f'Criterion_{i}'), stat,
+                               operator, threshold))
+            if stat not in measures:
+                measures[stat] = (stat, metric,
+                                  criterion.get('params', {}))
+                checks.setdefault(key, []).append(measures[stat])
+            costs[key] = max(costs.get(key, 0), criterion.get(
+                'cost', self.cost(criterion['interval'])))
+            if 'round' in criterion:
+                self.decimals[stat] = criterion['round']
+
+        self.stats = list(measures)
+        self.checks = sorted(
+            [(*key, costs[key], tuple(check)) for key, check in checks.items()],
+            key=lambda check: check[2])
+        self.description = spec.get('description') or '\n'.join(
+            ['Criteria:'] + [f'    {i}. {stat} {operator} {threshold}'
+                             for i, (_, stat, operator, threshold)
+                             in enumerate(self.rules, 1)]) + '\n'
+
+    @staticmethod
+    def cost(interval: str):
+        """Returns the number of `interval` bars in a regular 6.5h session,
+        e.g. 7 for 60m and 195 for 2m. Daily and longer bars cost 1."""
+        if not re.match(r'[0-9]+[mh]$', interval):
+            return 1
+        step = utils.interval2timedelta(interval)
+        return math.ceil(pd.Timedelta(hours=6.5) / step)
+
+    @classmethod
+    def load(cls, spec: any):
+        """Returns `Criteria` of `spec`, a dict or the path to a JSON file."""
+        if isinstance(spec, cls):
+            return spec
+        if isinstance(spec, str):
+            with open(spec, 'r') as f:
+                spec = json.load(f)
+        return cls(spec)
+
+    @classmethod
+    def _parse(cls, rule: str):
+        """Returns (operator, threshold) of `rule`. Thresholds that aren't
+        numbers are returned as names."""
+        match = re.match(r'\s*(<=|>=|==|!=|<|>)\s*(\S+)\s*$', rule)
+        if match is None:
+            raise ValueError(f"rule='{rule}' is not valid! Hint: rule is "
+                             f"'<operator> <threshold>', operator in "
+                             f"{list(cls.OPERATORS)}")
+        operator, threshold = match.groups()
+        try:
+            threshold = float(threshold)
+        except ValueError:
+            pass
+        return operator, threshold
+
+    def evaluate(self, frame: pd.DataFrame, stats: list = None, **kwargs):
+        """Returns the pass/fail result of each rule for each row of `frame`.
+
+        Each rule is a single comparison over a column of `frame`. NaN fails.
+
+        Parameters:
+            frame (pd.DataFrame): index=symbols, columns=stats.
+            stats (list): Stats whose rules to judge or None for all.
+            **kwargs: Values of named thresholds.
+
+        Returns:
+            pd.DataFrame: index=symbols, columns=criteria, values=bool
+        """
+        results = {}
+        for criterion, stat, operator, threshold in self.rules:
+            if stats is not None and stat not in stats:
+                continue
+            if isinstance(threshold, str):
+                if threshold not in kwargs:
+                    raise ValueError(f'{threshold}=None is not valid! Hint: '
+                                     f'pass {threshold} to judge {criterion}')
+                threshold = kwargs[threshold]
+            values = (frame[stat].to_numpy(dtype=float) if stat in frame
+                      else np.full(len(frame), np.nan))
+            with np.errstate(invalid='ignore'):
+                results[criterion] = (
+                    self.OPERATORS[operator](values, threshold)
+                    & ~np.isnan(values))
+        return pd.DataFrame(results, index=frame.index)
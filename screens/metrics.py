@@ -0,0 +1,116 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""--- metrics.py ---
+
+Named metrics that screening criteria are judged by.
+
+@author   Hank Adler
+@version  0.1.0
+@license  MIT
+
+--- Copyright (C) 2020 Hank Adler ---
+"""
+
+
+import datetime as dt
+
+import dateutil.relativedelta as rd
+import numpy as np
+import pandas as pd
+
+from stocks import Stock
+from statistics import Statistic
+
+
+class Metrics:
+    """A registry of metrics, each a function of a `Stock` returning a number.
+
+    Metrics get the stock with the history of the criterion they serve and
+    the criterion's `params` as keyword arguments. The history may be None,
+    in which case they return NaN or pull what they can.
+
+    Attributes:
+        registry (dict): keys=metric names, values=functions.
+    """
+    registry = {}
+
+    @classmethod
+    def register(cls, name: str, func=None):
+        """Registers `func` under `name`. Works as a decorator if `func` is
+        None."""
+        if func is None:
+            return lambda func: cls.register(name, func)
+        cls.registry[name] = func
+        return func
+
+    @classmethod
+    def compute(cls, symbol: str, period: str, interval: str,
+                history: pd.DataFrame, measures: tuple):
+        """Returns {stat: value} of `symbol`.
+
+        Parameters:
+            history (pd.DataFrame): History of `period` and `interval` or None.
+            measures (tuple): (stat, metric, params) tuples.
+        """
+        stock = Stock(symbol, period=period, interval=interval, fetch=False)
+        stock.history = history
+        values = {}
+        for stat, metric, params in measures:
+            if metric not in cls.registry:
+                raise ValueError(f'metric={metric} is not valid! Hint: '
+                                 f'metric in {list(cls.registry)}')
+            values[stat] = cls.registry[metric](stock, **params)
+        return values
+
+    @staticmethod
+    def avg_chg(stock: Stock):
+        """Returns the average %Chg of 'Low' from bar to bar."""
+        if stock.history is None:
+            return np.nan
+        return stock.history['Low'].pct_change().mean() * 100
+
+    @staticmethod
+    def avg_daily_rng(stock: Stock, noon='12:25:00'):
+        """Returns the average %Chg from the morning low to the lowest high
+        after `noon`, per session."""
+        if stock.history is None:
+            return np.nan
+        # One min per session, reduced over its rows at once.
+        sessions = stock.sessions
+        am = sessions.time_of_day <= pd.Timedelta(noon).value
+        am_lows = np.where(
+            am, stock.history['Low'].to_numpy(dtype=float), np.nan)
+        pm_highs = np.where(
+            am, np.nan, stock.history['High'].to_numpy(dtype=float))
+        am_min = np.fmin.reduceat(am_lows, sessions.starts)
+        pm_min = np.fmin.reduceat(pm_highs, sessions.starts)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            daily_ranges = ((pm_min - am_min) / am_min).tolist()
+        return sum(daily_ranges) / len(daily_ranges) * 100
+
+    @staticmethod
+    def hourly_chg(stock: Stock, window=1):
+        """Returns the average %Chg within the `window`-th window of
+        `Statistic.HOURLY_WINDOWS`."""
+        return getattr(Statistic(stock, what='HourlyChg'),
+                       f'hourly_pct_chg_{window}')
+
+    @staticmethod
+    def hourly_volume(stock: Stock):
+        """Returns the average volume within `Statistic.HOURLY_WINDOWS`."""
+        return Statistic(stock, what='HourlyChg').avg_volume
+
+    @staticmethod
+    def age(stock: Stock):
+        """Returns the number of whole years since the first bar."""
+        if stock.history is None:
+            return np.nan
+        date_0 = stock.history.index[0]
+        date_1 = dt.datetime.now(date_0.tzinfo)
+        return rd.relativedelta(date_1, date_0).years
+
+
+for name in ['avg_chg', 'avg_daily_rng', 'hourly_chg', 'hourly_volume',
+             'age']:
+    Metrics.register(name, getattr(Metrics, name))
+del name
@@ -0,0 +1,95 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""--- pipeline.py ---
+
+Chains screens into a funnel.
+
+@author   Hank Adler
+@version  0.1.0
+@license  MIT
+
+--- Copyright (C) 2020 Hank Adler ---
+"""
+
+
+import time
+
+import pandas as pd
+
+from .screens import Screener
+
+
+class Pipeline:
+    """Chains screens, each judging only the symbols the one before passed.
+
+    Stages share a store of the histories they fetched and the metrics they
+    computed, so a later stage never pulls or computes what an earlier one
+    already did.
+
+    Args:
+        stages (list): Criteria of each stage, as accepted by
+            `Screener.screen`, or (criteria, kwargs) tuples where kwargs are
+            the values of named thresholds, e.g. ('MaxAge', {'max_age': 20}).
+        workers (int): See `Screener.screen`.
+        processes (bool): See `Screener.screen`.
+        full (bool): See `Screener.screen`.
+        state (ScreenState): See `Screener`.
+
+    Attributes:
+        stages (list): (`Criteria`, kwargs) of each stage.
+        screeners (list): `Screener` of each stage holding its stats and
+            results after `run`.
+        store (dict): Histories and metric values of the last `run`. See
+            `Screener.screen`.
+        report (pd.DataFrame): index=Stage, columns=Criteria, Symbols (judged),
+            Survivors, Reused, Recomputed, Seconds. Set by `run`.
+    """
+
+    def __init__(self, stages: list, workers=1, processes=False, full=False,
+                 state=None):
+        self.stages = []
+        for stage in stages:
+            criteria, kwargs = stage if isinstance(stage, tuple) else (stage,
+                                                                       {})
+            self.stages.append((Screener.lookup(criteria), kwargs))
+        self.workers = workers
+        self.processes = processes
+        self.full = full
+        self.state = state
+        self.screeners = []
+        self.store = {}
+        self.report = None
+
+    def run(self, symbols: list):
+        """Returns the symbols that pass every stage.
+
+        Parameters:
+            symbols (list): Stock symbols entering the first stage.
+        """
+        self.screeners = []
+        self.store = {}
+        report = []
+        survivors = sorted(set(symbols))
+        for criteria, kwargs in self.stages:
+            screener = Screener(self.state)
+            t0 = time.perf_counter()
+            judged = len(survivors)
+            survivors = screener.screen(
+                survivors, criteria, workers=self.workers,
+                processes=self.processes, full=self.full, store=self.store,
+                **kwargs)
+            report.append({'Criteria': criteria.name, 'Symbols': judged,
+                           'Survivors': len(survivors),
+                           'Reused': len(screener.reused),
+                           'Recomputed': len(screener.recomputed),
+                           'Seconds': round(time.perf_counter() - t0, 2)})
+            self.screeners.append(screener)
+        self.report = pd.DataFrame(
+            report, index=pd.RangeIndex(1, len(report) + 1, name='Stage'))
+        return survivors
+
+    def print_summary(self):
+        for screener in self.screeners:
+            screener.print_summary()
+        print('--- Pipeline ---')
+        print(self.report, '\n')
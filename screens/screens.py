@@ -10,230 +10,447 @@ Screens stocks according to criteria.
 
 --- Copyright (C) 2020 Hank Adler ---
 """
+import concurrent.futures as cf
+import contextlib
 import datetime as dt
+import functools
 import textwrap
 
-import dateutil.relativedelta as rd
 import numpy as np
 import pandas as pd
 
-from stocks import Stock
-from statistics import Statistic
+from collector import Collector
+from indicators import BatchIndicators
+from statistics import ResultCache
+from .criteria import Criteria
+from .metrics import Metrics
+from .state import ScreenState
 
 
 class Screener:
     """Screens stocks according to criteria.
 
+    Each instance keeps the tables of its own screens, so several screens can
+    run side by side in one process.
+
+    Args:
+        state (ScreenState): State of past screens to reuse and update or
+            None to compute everything afresh.
+
     Attributes:
-        VALID_CRITERIA (str): Valid name switches for screening logic.
+        SPECS (list): Specs of the built-in criteria. See `Criteria`.
+        CRITERIA (dict): keys=names, values=`Criteria` that can be screened
+            by name. See `register`.
+        VALID_CRITERIA (list): Names of `CRITERIA`.
         DESCRIPTIONS (dict): keys=criteria, values=description.
-        criteria (str): Active screening criteria.
+        criteria (Criteria): Active screening criteria.
         stats (pd.DataFrame): Data assembled during screening.
         results (pd.DataFrame): Boolean table indicating pass/fail result of
             screening criteria.
+        failures (dict): keys=symbols, values=exception raised while screening
+            the symbol during the last `screen`.
+        state (ScreenState): State of past screens or None.
+        reused (list): Symbols of the last `screen` judged on metric values
+            served from the store or `state` alone.
+        recomputed (list): Symbols of the last `screen` with metric values
+            computed afresh.
     """
-    VALID_CRITERIA = ['Default', 'BigWaves', 'MaxAge']
-    DESCRIPTIONS = {
-        'Default': textwrap.dedent("""\
+    SPECS = [
+        {'name': 'Default',
+         'description': textwrap.dedent("""\
             Criteria:
                 1. Average monthly price change for period='max' > 0
                 2. Average weekly price change for period='1y' > 0
                 3. Average daily price change for period='3mo' > 0
                 4. Average daily range for period='3mo' > 3%
-        """),
-        'BigWaves': textwrap.dedent("""\
+         """),
+         'criteria': [
+             {'metric': 'avg_chg', 'rule': '> 0', 'period': 'max',
+              'interval': '1mo', 'stat': 'Avg_Monthly_Chg_(All)', 'round': 2},
+             {'metric': 'avg_chg', 'rule': '> 0', 'period': '1y',
+              'interval': '1wk', 'stat': 'Avg_Weekly_Chg_(1y)', 'round': 2},
+             {'metric': 'avg_chg', 'rule': '> 0', 'period': '3mo',
+              'interval': '1d', 'stat': 'Avg_Daily_Chg_(3mo)', 'round': 2},
+             {'metric': 'avg_daily_rng', 'rule': '> 3', 'period': '3mo',
+              'interval': '60m', 'stat': 'Avg_Daily_Rng_(3mo)', 'round': 2}]},
+        {'name': 'BigWaves',
+         'description': textwrap.dedent("""\
             Criteria:
                 1. %Chg 9:30 - 10:30 > 2.0
                 2. %Chg 10:30 - 11:30 > 1.0
                 3. %Chg 11:30 - 12:30 > 0.5
                 4. Avg. Volume 9:30 - 12:30 > 1M
-        """),
-        'MaxAge': textwrap.dedent("""\
+         """),
+         'criteria': [
+             {'metric': 'hourly_chg', 'params': {'window': i}, 'rule': rule,
+              'period': '60d', 'interval': Collector.DEFAULT_INTERVALS['60d'],
+              'stat': f'Hourly_%Chg_{i}'}
+             for i, rule in enumerate(['> 2.0', '> 1.0', '> 0.5'], 1)] + [
+             {'metric': 'hourly_volume', 'rule': '> 1_000_000',
+              'period': '60d', 'interval': Collector.DEFAULT_INTERVALS['60d'],
+              'stat': 'Avg_Volume'}]},
+        {'name': 'MaxAge',
+         'description': textwrap.dedent("""\
             Criteria:
                 1. Company's age is less than `age`
-        """)}
-    criteria = VALID_CRITERIA[0]
-    stats = None
-    results = None
+         """),
+         'criteria': [
+             {'metric': 'age', 'rule': '<= max_age', 'period': 'max',
+              'interval': '1d', 'stat': 'Age_(Years)'}]}]
+    CRITERIA = {spec['name']: Criteria(spec) for spec in SPECS}
+    VALID_CRITERIA = list(CRITERIA)
+    DESCRIPTIONS = {name: criteria.description
+                    for name, criteria in CRITERIA.items()}
+
+    def __init__(self, state: ScreenState = None):
+        self.criteria = self.CRITERIA[self.VALID_CRITERIA[0]]
+        self.stats = None
+        self.results = None
+        self.failures = {}
+        self.state = state
+        self.reused = []
+        self.recomputed = []
+
+    @classmethod
+    def register(cls, spec: any):
+        """Makes the criteria of `spec` screenable by name.
+
+        Parameters:
+            spec (any): dict or path to a JSON file. See `Criteria`.
+        """
+        criteria = Criteria.load(spec)
+        if criteria.name not in cls.CRITERIA:
+            cls.VALID_CRITERIA.append(criteria.name)
+        cls.CRITERIA[criteria.name] = criteria
+        cls.DESCRIPTIONS[criteria.name] = criteria.description
+        return criteria
 
     @classmethod
-    def clear(cls):
+    def lookup(cls, criteria: any):
+        """Returns the `Criteria` of `criteria`.
+
+        Parameters:
+            criteria (any): Name in `VALID_CRITERIA`, `Criteria` or spec. See
+                `Criteria.load`.
+        """
+        if isinstance(criteria, str) and criteria in cls.CRITERIA:
+            return cls.CRITERIA[criteria]
+        if isinstance(criteria, str) and not criteria.endswith('.json'):
+            raise ValueError(f'criteria={criteria} is not valid! Hint: '
+                             f'criteria in {cls.VALID_CRITERIA}')
+        return Criteria.load(criteria)
+
+    def clear(self):
         """Resets `stats` and `results` to None."""
-        cls.stats = None
-        cls.results = None
+        self.stats = None
+        self.results = None
         print('\tCleared Screener.')
 
-    @classmethod
-    def screen(cls, symbols: list, criteria=VALID_CRITERIA[0], **kwargs):
-        """Returns the symbols that meet the screening criteria."""
+    def screen(self, symbols: list, criteria=VALID_CRITERIA[0], workers=1,
+               processes=False, full=False, store: dict = None, **kwargs):
+        """Returns the symbols that meet the screening criteria.
+
+        Checks run cheapest first, each over all symbols still standing, and
+        each rule is judged for all of them in one comparison. Symbols are
+        dropped at their first failed check, so the histories of later
+        checks aren't fetched. Their stats are left NaN and their results NA
+        unless `full` is True.
+
+        Rows for the screened symbols are added to `stats` and `results` in
+        sorted order, however many `workers` there are. A symbol that raises
+        is recorded in `failures` and screened out; the rest carry on.
+
+        Metric values are reused from `store` and `state` for as long as the
+        history they were computed from is unchanged, and the rules are
+        judged afresh, so the outcome is that of a run from scratch.
+        Histories are still pulled to find out whether they gained bars.
+
+        Parameters:
+            symbols (list): Stock symbols.
+            criteria (any): Name in `VALID_CRITERIA`, `Criteria` or spec. See
+                `Criteria.load`.
+            workers (int): Number of threads fetching histories and, unless
+                `processes` is True, computing metrics.
+            processes (bool): Whether to compute metrics on a process pool so
+                that the computation runs on all CPUs.
+            full (bool): Whether to run every check for every symbol.
+            store (dict): Histories and metric values to reuse and add to,
+                keys=(symbol, period, interval), values=dicts with the
+                history under 'history' and values under (metric, params).
+                See `Pipeline`.
+            **kwargs: Values of named thresholds, e.g. `max_age` for
+                'MaxAge'.
+        """
+        criteria = self.lookup(criteria)
         symbols = sorted(set(symbols))
-        cls.criteria = criteria
-
-        print(f'=== Screen: {criteria} ===')
+        self.criteria = criteria
+        self.failures = {}
+        self.reused = []
+        self.recomputed = []
+
+        print(f'=== Screen: {criteria.name} ===')
+
+        if store is None:
+            store = {}
+        if self.state is not None:
+            for symbol in symbols:
+                for (period, interval), entry in self.state.load(
+                        symbol).items():
+                    store.setdefault((symbol, period, interval), entry)
+
+        values = {}
+        checked = {}
+        computed = set()
+        with contextlib.ExitStack() as stack:
+            threads = None
+            compute = None
+            if workers > 1 or processes:
+                threads = stack.enter_context(
+                    cf.ThreadPoolExecutor(max_workers=max(workers, 1)))
+            if processes:
+                # Threads fetch and wait while the pool computes.
+                pool = stack.enter_context(cf.ProcessPoolExecutor())
+                compute = functools.partial(self._submit, pool)
+
+            remaining = symbols
+            for i, check in enumerate(criteria.checks):
+                period, interval, _, measures = check
+                print(f'\tChecking {len(remaining)} symbols on '
+                      f'{interval} bars over {period}...')
+                measured = self._measure_many(
+                    remaining, check, threads, compute, store)
+                rows = Columns()
+                for symbol in remaining:
+                    if symbol in measured:
+                        symbol_values, fresh = measured[symbol]
+                        values.setdefault(symbol, {}).update(symbol_values)
+                        checked.setdefault(symbol, set()).add(i)
+                        rows.append(symbol, symbol_values)
+                        if fresh:
+                            computed.add(symbol)
+                if not len(rows):
+                    break
+                if full:
+                    remaining = rows.labels
+                    continue
+                passed = criteria.evaluate(
+                    rows.extend(), [stat for stat, _, _ in measures],
+                    **kwargs).all(axis=1)
+                remaining = list(passed.index[passed])
+
+        judged = [symbol for symbol in symbols if symbol not in self.failures
+                  and symbol in values]
+        self.reused = [symbol for symbol in judged if symbol not in computed]
+        self.recomputed = [symbol for symbol in judged if symbol in computed]
+        if self.state is not None:
+            entries = {}
+            for (symbol, period, interval), entry in store.items():
+                entries.setdefault(symbol, {})[(period, interval)] = entry
+            for symbol in self.recomputed:
+                self.state.save(symbol, entries[symbol])
+        print(f'\tReused {len(self.reused)} symbols, recomputed '
+              f'{len(self.recomputed)}.')
+        if not judged:
+            return []
+        rows = Columns()
+        for symbol in judged:
+            rows.append(symbol, {stat: values[symbol].get(stat, np.nan)
+                                 for stat in criteria.stats})
+        frame = rows.extend()
+        results = criteria.evaluate(frame, **kwargs)
+
+        # Criteria of checks a symbol didn't get to are unknown.
+        done = np.array([[i in checked[symbol]
+                          for i in range(len(criteria.checks))]
+                         for symbol in judged]).reshape(len(judged), -1)
+        passed = results.all(axis=1).to_numpy() & done.all(axis=1)
+        if not full:
+            stat_check = {stat: i for i, check in enumerate(criteria.checks)
+                          for stat, _, _ in check[3]}
+            results = results.astype('boolean')
+            for criterion, stat, _, _ in criteria.rules:
+                results.loc[~done[:, stat_check[stat]], criterion] = pd.NA
+
+        stats = frame.round(criteria.decimals)
+        self.stats = (stats if self.stats is None
+                      else pd.concat([self.stats, stats]))
+        self.results = (results if self.results is None
+                        else pd.concat([self.results, results]))
+        if self.failures:
+            print(f'\tFailed: {sorted(self.failures)}')
+
+        return [symbol for symbol, ok in zip(judged, passed) if ok]
+
+    def _measure_many(self, symbols: list, check: tuple,
+                      threads: cf.Executor = None, compute=None,
+                      store: dict = None):
+        """Returns {symbol: `_measure` result} of `check` for `symbols`,
+        measured on `threads` if any. Symbols that raise are recorded in
+        `failures`."""
+        measured = {}
+        if threads is None:
+            for symbol in symbols:
+                try:
+                    measured[symbol] = self._measure(
+                        symbol, check, compute, store)
+                except Exception as e:
+                    self.failures[symbol] = e
+            return measured
+
+        futures = {symbol: threads.submit(
+            self._measure, symbol, check, compute, store)
+            for symbol in symbols}
+        for symbol, future in futures.items():
+            try:
+                measured[symbol] = future.result()
+            except Exception as e:
+                self.failures[symbol] = e
+        return measured
 
-        screened = []
-        for symbol in symbols:
-            print(f'\tScreening {symbol}...')
-            mask = cls._judge(symbol, criteria, **kwargs)
-            if sum(mask) == len(mask):
-                screened.append(symbol)
+    @classmethod
+    def _measure(cls, symbol: str, check: tuple, compute=None,
+                 store: dict = None):
+        """Returns ({stat: value}, fresh) of `symbol`, where fresh tells
+        whether any value was computed rather than taken from `store`.
+
+        The history of `check` is fetched unless it's in `store`. Values in
+        `store` from a history with another fingerprint are dropped.
+
+        Parameters:
+            check (tuple): See `Criteria.checks`.
+            compute (callable): Stand-in for `Metrics.compute`, e.g. to run
+                it in another process.
+            store (dict): See `screen`.
+        """
+        period, interval, _, measures = check
+        entry = {} if store is None else store.setdefault(
+            (symbol, period, interval), {})
+        keys = {stat: (metric, repr(sorted(params.items())))
+                for stat, metric, params in measures}
+        if 'history' not in entry:
+            history = Collector.get_history(
+                symbol, period=period, interval=interval)
+            fingerprint = ResultCache.fingerprint(history)
+            if entry.get('fingerprint') != fingerprint:
+                # The history changed since the values were computed.
+                entry.clear()
+                entry['fingerprint'] = fingerprint
+            entry['history'] = history
+        missing = tuple(measure for measure in measures
+                        if keys[measure[0]] not in entry)
+        if missing:
+            values = (compute or Metrics.compute)(
+                symbol, period, interval, entry['history'], missing)
+            for stat, value in values.items():
+                entry[keys[stat]] = value
+        return ({stat: entry[key] for stat, key in keys.items()},
+                bool(missing))
 
-        return screened
+    @classmethod
+    def _submit(cls, pool: cf.Executor, *args, **kwargs):
+        """Runs `Metrics.compute` on `pool` and returns its result."""
+        return pool.submit(Metrics.compute, *args, **kwargs).result()
 
     @classmethod
-    def _judge(cls, symbol: str, criteria: str, **kwargs):
-        """Sets `stats` and `results` according to screening criteria.
+    def snapshot(cls, symbols: list, indicators: any, period='60d',
+                 interval=Collector.DEFAULT_INTERVALS['60d'],
+                 source=Collector.SOURCES[0], **kwargs):
+        """Returns the latest indicator values of `symbols`.
+
+        Histories are fetched concurrently and the indicators computed for all
+        symbols at once by `BatchIndicators`. Symbols without a history are
+        left out.
+
+        Parameters:
+            symbols (list): Stock symbols.
+            indicators (any -> list): See `BatchIndicators.compute`.
+            period (str): See `Collector.get_history`.
+            interval (str): See `Collector.get_history`.
+            source (str): See `Collector.get_history`.
+            **kwargs: Indicator parameters. See `BatchIndicators.compute`.
 
         Returns:
-            tuple: Booleans indicating pass/fail result of screening criteria.
+            pd.DataFrame: index=Stock, columns=indicator columns
         """
-        for k, v in kwargs.items():
-            if k == 'max_age':
-                max_age = v
-
-        mask = []
-        if criteria == cls.VALID_CRITERIA[0]:
-            # Checks criterion 1.
-            stock = Stock(symbol, period='max', interval='1mo')
-            if stock.history is not None:
-                avg_monthly_chg = stock.history['Low'].pct_change().mean()
-                avg_monthly_chg *= 100
-            else:
-                avg_monthly_chg = np.nan
-            crit_1 = avg_monthly_chg > 0
-
-            # Checks criterion 2.
-            stock = Stock(symbol, period='1y', interval='1wk')
-            if stock.history is not None:
-                avg_weekly_chg = stock.history['Low'].pct_change().mean()
-                avg_weekly_chg *= 100
-            else:
-                avg_weekly_chg = np.nan
-            crit_2 = avg_weekly_chg > 0
-
-            # Checks criterion 3.
-            stock = Stock(symbol, period='3mo', interval='1d')
-            if stock.history is not None:
-                avg_daily_chg = stock.history['Low'].pct_change().mean()
-                avg_daily_chg *= 100
-            else:
-                avg_daily_chg = np.nan
-            crit_3 = avg_daily_chg > 0
-
-            # Checks criterion 4.
-            stock = Stock(symbol, period='3mo', interval='60m')
-            if stock.history is not None:
-                ls = [g[1] for g in stock.history.groupby(
-                    stock.history.index.day, sort=False)]
-                daily_ranges = []
-                for df in ls:
-                    am_lows = df[df.index.time <= dt.time(12, 25)]['Low']
-                    am_min = am_lows.min()
-                    pm_highs = df[df.index.time > dt.time(12, 25)]['High']
-                    pm_min = pm_highs.min()
-                    daily_ranges.append((pm_min - am_min) / am_min)
-                avg_daily_rng = sum(daily_ranges) / len(daily_ranges)
-                avg_daily_rng *= 100
-            else:
-                avg_daily_rng = np.nan
-            crit_4 = avg_daily_rng > 3
-
-            cls.stats = pd.concat([cls.stats, pd.DataFrame(
-                data={'Avg_Monthly_Chg_(All)': avg_monthly_chg,
-                      'Avg_Weekly_Chg_(1y)': avg_weekly_chg,
-                      'Avg_Daily_Chg_(3mo)': avg_daily_chg,
-                      'Avg_Daily_Rng_(3mo)': avg_daily_rng},
-                index=[symbol]).round(2)])
-            if not cls.stats.index.name:
-                cls.stats.index.name = 'Stock'
-
-            cls.results = pd.concat([cls.results, pd.DataFrame(
-                data={'Criterion_1': crit_1, 'Criterion_2': crit_2,
-                      'Criterion_3': crit_3, 'Criterion_4': crit_4},
-                index=[symbol])])
-            if not cls.results.index.name:
-                cls.results.index.name = 'Stock'
-
-            mask = (crit_1, crit_2, crit_3, crit_4)
-
-        elif criteria == cls.VALID_CRITERIA[1]:
-            stock = Stock(symbol)
-            stat = Statistic(stock, what='HourlyChg')
-
-            # Checks criterion 1.
-            crit_1 = stat.hourly_pct_chg_1 > 2.0
-
-            # Checks criterion 2.
-            crit_2 = stat.hourly_pct_chg_2 > 1.0
-
-            # Checks criterion 3.
-            crit_3 = stat.hourly_pct_chg_3 > 0.5
-
-            # Checks criterion 4.
-            crit_4 = stat.avg_volume > 1_000_000
-
-            # Set stats.
-            cls.stats = pd.concat([cls.stats, pd.DataFrame(
-                data={'Hourly_%Chg_1': stat.hourly_pct_chg_1,
-                      'Hourly_%Chg_2': stat.hourly_pct_chg_2,
-                      'Hourly_%Chg_3': stat.hourly_pct_chg_3,
-                      'Avg_Volume': stat.avg_volume},
-                index=[symbol])])
-            if not cls.stats.index.name:
-                cls.stats.index.name = 'Stock'
-
-            # Set results.
-            cls.results = pd.concat([cls.results, pd.DataFrame(
-                data={'Criterion_1': crit_1,
-                      'Criterion_2': crit_2,
-                      'Criterion_3': crit_3,
-                      'Criterion_4': crit_4},
-                index=[symbol])])
-            if not cls.results.index.name:
-                cls.results.index.name = 'Stock'
-
-            mask = (crit_1, crit_2, crit_3, crit_4)
-
-        elif criteria == cls.VALID_CRITERIA[2]:
-            stock = Stock(symbol, period='max', interval='1d')
-
-            # Checks criterion 1.
-            date_0 = stock.history.index[0]
-            date_1 = dt.datetime.today()
-            diff_in_years = rd.relativedelta(date_1, date_0).years
-
-            crit_1 = diff_in_years <= max_age
-
-            mask = (crit_1,)
-
-        return mask
-
-    @classmethod
-    def print_summary(cls):
+        if isinstance(indicators, str):
+            indicators = indicators.split()
+        histories, _ = Collector.get_histories(
+            sorted(set(symbols)), period=period, interval=interval,
+            source=source)
+        computed = BatchIndicators.compute(
+            histories, [indicator.upper() for indicator in indicators],
+            **kwargs)
+        snapshot = pd.DataFrame.from_dict(
+            {symbol: df.iloc[-1] for symbol, df in computed.items()
+             if not df.empty}, orient='index').sort_index()
+        snapshot.index.name = 'Stock'
+        return snapshot
+
+    def print_summary(self):
         pd.set_option('display.max_rows', None, 'display.max_columns', None)
-        print(cls.DESCRIPTIONS[cls.criteria])
+        print(self.criteria.description)
         print('--- Stats ---')
-        print(cls.stats, '\n')
+        print(self.stats, '\n')
         print('--- Results ---')
-        print(cls.results, '\n')
+        print(self.results, '\n')
         pd.reset_option('display.max_rows')
         pd.reset_option('display.max_columns')
 
-    @classmethod
-    def export_summary(cls, dir='.', fname='screen'):
-        if cls.stats is not None:
+    def export_summary(self, dir='.', fname='screen'):
+        if self.stats is not None:
             today = dt.datetime.today().strftime('%Y-%m-%d')
             pathout = f'{dir}/{fname}_{today}.txt'
             with open(pathout, 'w') as fh:
                 fh.write('--- Stats ---\n')
-                Screener.stats.to_string(fh)
+                self.stats.to_string(fh)
                 fh.write('\n\n')
                 fh.write('--- Results ---\n')
-                Screener.results.to_string(fh)
+                self.results.to_string(fh)
             print(f"Exported results to '{pathout}'.")
         else:
             print('No `stats` or `results` to export.')
 
 
+class Columns:
+    """Rows of a table kept column by column, so that adding a row doesn't
+    copy the table. The table is built once, by `extend`.
+
+    Attributes:
+        labels (list): Row labels, in order of addition.
+        columns (dict): keys=column names, values=lists of row values.
+    """
+
+    def __init__(self):
+        self.labels = []
+        self.columns = {}
+
+    def __len__(self):
+        return len(self.labels)
+
+    def append(self, label: any, row: dict):
+        """Adds `row`, {column: value}. Missing values are NaN."""
+        for name, value in row.items():
+            self.columns.setdefault(name, [np.nan] * len(self.labels))
+            self.columns[name].append(value)
+        self.labels.append(label)
+        for values in self.columns.values():
+            if len(values) < len(self.labels):
+                values.append(np.nan)
+
+    def extend(self, df: pd.DataFrame = None, name='Stock'):
+        """Returns `df` with the rows appended, or `df` if there are none.
+
+        Parameters:
+            df (pd.DataFrame): Table to extend or None.
+            name (str): Name of the index of the returned table.
+        """
+        if not self.labels:
+            return df
+        rows = pd.DataFrame(self.columns, index=self.labels)
+        df = rows if df is None else pd.concat([df, rows])
+        df.index.name = name
+        return df
+
+
 if __name__ == '__main__':
     pass
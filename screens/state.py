@@ -0,0 +1,79 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""--- state.py ---
+
+On-disk state of past screens, per symbol.
+
+@author   Hank Adler
+@version  0.1.0
+@license  MIT
+
+--- Copyright (C) 2020 Hank Adler ---
+"""
+
+
+import glob
+import os
+import pickle
+import threading
+
+
+class ScreenState:
+    """Keeps the metric values each symbol was screened with, alongside the
+    fingerprint of the history they were computed from.
+
+    Entries are keyed by symbol, each a pickle of {(period, interval): entry}
+    where entry holds the history's fingerprint under 'fingerprint' and
+    metric values under (metric, params), as in the store of
+    `Screener.screen`. A re-screen reuses values as long as the history's
+    fingerprint is unchanged.
+
+    Args:
+        dir (str): Directory holding the entries.
+
+    Attributes:
+        dir (str): Directory holding the entries.
+    """
+
+    def __init__(self, dir: str):
+        self.dir = dir
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _path(self, symbol: str):
+        return f'{self.dir}/{symbol}.pkl'
+
+    def load(self, symbol: str):
+        """Returns the entries of `symbol`, empty if there are none."""
+        with self._lock:
+            if symbol not in self._entries:
+                try:
+                    with open(self._path(symbol), 'rb') as f:
+                        self._entries[symbol] = pickle.load(f)
+                except (OSError, ValueError, EOFError,
+                        pickle.UnpicklingError):
+                    self._entries[symbol] = {}
+            return {key: dict(entry)
+                    for key, entry in self._entries[symbol].items()}
+
+    def save(self, symbol: str, entries: dict):
+        """Replaces the entries of `symbol`. Histories aren't kept."""
+        entries = {key: {k: v for k, v in entry.items() if k != 'history'}
+                   for key, entry in entries.items()}
+        with self._lock:
+            self._entries[symbol] = entries
+            os.makedirs(self.dir, exist_ok=True)
+            path = self._path(symbol)
+            with open(f'{path}.tmp', 'wb') as f:
+                pickle.dump(entries, f)
+            os.replace(f'{path}.tmp', path)
+
+    def clear(self, symbol='*'):
+        """Deletes the entries of `symbol`. Defaults to all."""
+        with self._lock:
+            if symbol == '*':
+                self._entries.clear()
+            else:
+                self._entries.pop(symbol, None)
+            for path in glob.glob(self._path(symbol)):
+                os.remove(path)
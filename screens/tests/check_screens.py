@@ -12,30 +12,78 @@ Checks screens module.
 """
 
 
+import concurrent.futures as cf
+import time
+
 import config, utils
-from screens import Screener
+from screens import Pipeline, Screener, ScreenState
 
 
 unscreened_txt = f'{config.ASSETS_DIR}/stocks-unscreened.txt'
 screened_txt = f'{config.ASSETS_DIR}/stocks-screened.txt'
 symbols = utils.txt2symbols(unscreened_txt)
+screener = Screener()
 
 
 def check_default():
-    screened = Screener.screen(symbols)
-    Screener.print_summary()
-    Screener.export_summary()
+    screened = screener.screen(symbols)
+    screener.print_summary()
+    screener.export_summary()
     print(f'PASS Symbols = {screened}\n')
 
-    Screener.clear()
-    print(Screener.stats)
-    print(Screener.results)
+    screener.clear()
+    print(screener.stats)
+    print(screener.results)
+
+
+def check_default_parallel():
+    for workers in [1, 16]:
+        screener.clear()
+        t0 = time.perf_counter()
+        screened = screener.screen(symbols[:100], workers=workers)
+        print(f'workers={workers}: {len(screened)} passed in '
+              f'{time.perf_counter() - t0:.1f}s, '
+              f'failures={list(screener.failures)}\n')
+    screener.print_summary()
+
+
+def check_full():
+    for full in [False, True]:
+        screener.clear()
+        t0 = time.perf_counter()
+        screened = screener.screen(symbols[:100], full=full)
+        print(f'full={full}: {len(screened)} passed in '
+              f'{time.perf_counter() - t0:.1f}s\n')
+        screener.print_summary()
+
+
+def check_side_by_side():
+    screeners = {criteria: Screener() for criteria in ['Default', 'BigWaves']}
+    with cf.ThreadPoolExecutor() as pool:
+        screened = {criteria: pool.submit(s.screen, symbols[:50], criteria)
+                    for criteria, s in screeners.items()}
+    for criteria, s in screeners.items():
+        s.print_summary()
+        print(f'PASS Symbols ({criteria}) = {screened[criteria].result()}\n')
+
+
+def check_spec():
+    spec = {'name': 'Uptrend',
+            'criteria': [
+                {'metric': 'avg_chg', 'rule': '> 0', 'period': '1y',
+                 'interval': '1wk', 'stat': 'Avg_Weekly_Chg_(1y)', 'round': 2},
+                {'metric': 'age', 'rule': '<= max_age', 'period': 'max',
+                 'interval': '1d', 'stat': 'Age_(Years)'}]}
+    Screener.register(spec)
+    screened = screener.screen(symbols[:100], criteria='Uptrend', max_age=20)
+    screener.print_summary()
+    print(f'PASS Symbols ({len(screened)}) = {screened}\n')
 
 
 def check_maxage():
-    screened = Screener.screen(symbols, criteria='MaxAge', max_age=20)
-    Screener.print_summary()
-    Screener.export_summary()
+    screened = screener.screen(symbols, criteria='MaxAge', max_age=20)
+    screener.print_summary()
+    screener.export_summary()
     print(f'PASS Symbols ({len(screened)}) = {screened}\n')
     utils.symbols2txt(screened, screened_txt)
     print(f"Screened symbols written to '{screened_txt}'.")
@@ -43,16 +91,49 @@ def check_maxage():
 
 def check_bigwaves():
     symbols = utils.txt2symbols(screened_txt)
-    screened = Screener.screen(symbols, criteria='BigWaves')
-    Screener.print_summary()
-    Screener.export_summary()
+    screened = screener.screen(symbols, criteria='BigWaves')
+    screener.print_summary()
+    screener.export_summary()
     print(f'PASS Symbols ({len(screened)}) = {screened}\n')
     utils.symbols2txt(screened, screened_txt)
     print(f"Screened symbols written to '{screened_txt}'.")
 
 
+def check_pipeline():
+    pipeline = Pipeline([('MaxAge', {'max_age': 20}), 'BigWaves'], workers=16)
+    screened = pipeline.run(symbols)
+    pipeline.print_summary()
+    print(f'PASS Symbols ({len(screened)}) = {screened}\n')
+
+
+def check_incremental():
+    state = ScreenState(config.STATE_DIR)
+    for _ in range(2):
+        incremental = Screener(state)
+        t0 = time.perf_counter()
+        screened = incremental.screen(symbols[:100])
+        print(f'{len(screened)} passed in {time.perf_counter() - t0:.1f}s, '
+              f'reused={len(incremental.reused)}, '
+              f'recomputed={len(incremental.recomputed)}\n')
+    incremental.print_summary()
+
+
+def check_snapshot():
+    snapshot = Screener.snapshot(symbols, 'RSI SMA BBANDS', window=14)
+    print(snapshot)
+    print(f'Oversold ({sum(snapshot["RSI"] < 30)}) = '
+          f'{list(snapshot.index[snapshot["RSI"] < 30])}\n')
+
+
 if __name__ == '__main__':
+    #check_snapshot()
     #check_default()
+    #check_default_parallel()
+    #check_side_by_side()
+    #check_full()
+    #check_spec()
+    #check_pipeline()
+    #check_incremental()
     # The following two functions must be chained!
     #check_maxage()
     check_bigwaves()
@@ -10,6 +10,7 @@ setup(
         'collector',
         'gui',
         'indicators',
+        'markets',
         'plots',
         'screens',
         'statistics',
@@ -1 +1,2 @@
 from .statistics import *
+from .results import *
@@ -0,0 +1,169 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""--- results.py ---
+
+Cache of calculated statistics.
+
+@author   Hank Adler
+@version  0.1.0
+@license  MIT
+
+--- Copyright (C) 2020 Hank Adler ---
+"""
+
+
+import collections
+import glob
+import hashlib
+import os
+import pickle
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+class ResultCache:
+    """A bounded LRU of statistic results keyed by the data they came from.
+
+    Keys are (symbol, what, kwargs, fingerprint of the history), so a result
+    is reused only as long as the history it was calculated from is
+    unchanged. Entries can also be kept on disk, one pickle per key, so they
+    outlive the process.
+
+    Args:
+        size (int): Max number of entries in memory.
+        dir (str): Directory holding the entries on disk or None to keep
+            them in memory only.
+        disk_size (int): Max number of entries on disk. The least recently
+            used are deleted first.
+
+    Attributes:
+        size (int): Max number of entries in memory.
+        dir (str): Directory holding the entries on disk or None.
+        disk_size (int): Max number of entries on disk.
+        hits (int): Lookups served from memory or disk.
+        misses (int): Lookups that found nothing.
+        evictions (int): Entries dropped from memory to stay within `size`.
+    """
+
+    def __init__(self, size=256, dir: str = None, disk_size=4096):
+        self.size = size
+        self.dir = dir
+        self.disk_size = disk_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def fingerprint(history: pd.DataFrame):
+        """Returns a digest of `history`: its row count, last timestamp and a
+        hash of its index, columns and values."""
+        if history is None or history.empty:
+            return 'empty'
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(repr(list(history.columns)).encode())
+        digest.update(np.ascontiguousarray(history.index.asi8).data)
+        for column in history:
+            values = history[column].to_numpy()
+            if values.dtype == object:
+                digest.update(repr(values.tolist()).encode())
+            else:
+                digest.update(np.ascontiguousarray(values).data)
+        return (f'{len(history)}-{history.index[-1].value}-'
+                f'{digest.hexdigest()}')
+
+    @classmethod
+    def key(cls, symbol: str, what: str, kwargs: dict,
+            history: pd.DataFrame):
+        """Returns the key of a result."""
+        return (symbol, what, repr(sorted(kwargs.items())),
+                cls.fingerprint(history))
+
+    def get(self, key: tuple):
+        """Returns the value stored under `key` or None."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+        value = self._load(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._put(key, value)
+        return value
+
+    def put(self, key: tuple, value: dict):
+        """Stores `value` under `key`, evicting the least recently used."""
+        with self._lock:
+            self._put(key, value)
+        if self.dir is not None:
+            self._save(key, value)
+
+    def clear(self):
+        """Drops all entries, on disk too. Counters are kept."""
+        with self._lock:
+            self._entries.clear()
+        if self.dir is not None:
+            for path in glob.glob(f'{self.dir}/*.pkl'):
+                os.remove(path)
+
+    def stats(self):
+        """Returns the counters and current size as a dict."""
+        return {'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'size': len(self._entries)}
+
+    def _put(self, key: tuple, value: dict):
+        """Stores `value` in memory. Call under `_lock`."""
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _path(self, key: tuple):
+        name = hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()
+        return f'{self.dir}/{name}.pkl'
+
+    def _load(self, key: tuple):
+        """Returns the value stored on disk under `key` or None."""
+        if self.dir is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                stored_key, value = pickle.load(f)
+        except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+            return None
+        if stored_key != key:
+            return None
+        # Marks the entry as recently used.
+        os.utime(path)
+        return value
+
+    def _save(self, key: tuple, value: dict):
+        """Writes the entry to disk and deletes the least recently used ones
+        past `disk_size`."""
+        os.makedirs(self.dir, exist_ok=True)
+        path = self._path(key)
+        with open(f'{path}.tmp', 'wb') as f:
+            pickle.dump((key, value), f)
+        os.replace(f'{path}.tmp', path)
+
+        paths = glob.glob(f'{self.dir}/*.pkl')
+        if len(paths) > self.disk_size:
+            paths.sort(key=os.path.getmtime)
+            for path in paths[:len(paths) - self.disk_size]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
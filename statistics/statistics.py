@@ -12,10 +12,21 @@ Contains class definition for stocks statistics.
 """
 
 
+import concurrent.futures as cf
+import contextlib
+import functools
+import io
+import os
+import re
+
+import numpy as np
 import pandas as pd
 
-from stocks import Stock
+import utils
+from stocks import Sessions, Stock, StockFactory
 from collector import Collector
+from markets import MarketCalendar
+from .results import ResultCache
 
 
 class Statistic:
@@ -32,10 +43,16 @@ class Statistic:
 
     Attributes:
         VALID_WHATS (list): Valid types of statistics.
+        HOURLY_WINDOWS (list): Default HourlyChg windows.
+        results (ResultCache): Results of past calculations, reused while
+            the history they came from is unchanged. Assign a `ResultCache`
+            with a `dir` to keep them on disk.
         data (pd.DataFrame): The calculated statistic.
     """
 
     VALID_WHATS = ['FirstN', 'VolRSI', 'Gobo', 'SimpleRSI', 'HourlyChg']
+    HOURLY_WINDOWS = [('9:30', '10:30'), ('10:30', '11:30'), ('11:30', '12:30')]
+    results = ResultCache()
 
     def __init__(self, stock: Stock, what: str, metadata='', **kwargs):
         self._stock = None
@@ -68,24 +85,42 @@ class Statistic:
     def stock(self, value):
         """Ensures the following:
             1. `value` is a `Stock` object or `None`.
-            2. History is available or it can be made available by reducing the
-               `period` attribute of `value`.
+            2. History is available or it can be made available by fetching
+               `value` over a shorter period.
+
+        Periods `Collector.availability` knows to have no data are skipped,
+        so a deferred `value` is first fetched with one that may. The
+        `period` attribute of `value` is left as the caller set it.
         """
         print(f'Processing stock...')
         stock = value
         if not isinstance(stock, Stock):
             raise TypeError('`stock` must be a `Stock` object!')
-        if stock.history is None:
-            start = Collector.VALID_PERIODS.index(stock.period) - 1
-            if start < 0:
+        fetched = None
+        if not stock.loaded or stock.history is None:
+            if stock.period in Collector.VALID_PERIODS:
+                candidates = Collector.VALID_PERIODS[
+                    :Collector.VALID_PERIODS.index(stock.period) + 1][::-1]
+            else:
+                candidates = [stock.period]
+            periods = Collector.availability.periods(
+                stock.symbol, stock.source, stock.interval, candidates)
+            if not periods:
+                print(f'\t{stock.symbol} has no data. Skipping...')
                 self._stock = None
                 return
-            while(stock.history is None and start >= 0):
-                print(f"\tResetting {stock.symbol} period to '"
-                      f"{Collector.VALID_PERIODS[start]}'...")
-                stock.period = Collector.VALID_PERIODS[start]
-                stock.refresh()
-                start -= 1
+            if not stock.loaded:
+                fetched = periods[0]
+                if fetched != stock.period:
+                    stock.refresh(fetched)
+        if stock.history is None:
+            for period in periods:
+                if period in [stock.period, fetched]:
+                    continue
+                print(f"\tRefetching {stock.symbol} with period='{period}'...")
+                stock.refresh(period)
+                if stock.history is not None:
+                    break
             if stock.history is None:
                 self._stock = None
                 return
@@ -93,10 +128,34 @@ class Statistic:
         print(f'\tDone.\n')
 
     def calculate(self, stock: Stock, what: str, **kwargs):
-        """Sets `data` to results from `what` statistic calculation."""
+        """Sets `data` to results from `what` statistic calculation.
+
+        Results already in `results` for the same history and arguments are
+        reused, along with the metadata and attributes they came with.
+        """
         if what not in self.VALID_WHATS:
             raise ValueError(f'Invalid $what={what}! Hint: {self.VALID_WHATS}')
 
+        key = self.results.key(stock.symbol, what, kwargs, stock.history)
+        cached = self.results.get(key)
+        if cached is not None:
+            print(f'Reusing cached {what}...')
+            self.data = cached['data'].copy()
+            self.metadata += cached['metadata']
+            for k, v in cached['attributes'].items():
+                setattr(self, k, v)
+        else:
+            self._calculate(stock, what, key, **kwargs)
+
+        if not hasattr(stock, 'statistics'):
+            setattr(stock, 'statistics', {})
+        stock.statistics[what] = self
+
+    def _calculate(self, stock: Stock, what: str, key: tuple, **kwargs):
+        """Calculates `what` statistic and stores it in `results` as `key`."""
+        metadata = self.metadata
+        attributes = set(vars(self))
+
         if what == 'FirstN':
             self.data = self._calculate_firstn(stock, **kwargs)
         elif what == 'VolRSI':
@@ -108,9 +167,90 @@ class Statistic:
         elif what == 'HourlyChg':
             self.data = self._calculate_hourlychg(stock, **kwargs)
 
-        if not hasattr(stock, 'statistics'):
-            setattr(stock, 'statistics', {})
-        stock.statistics[what] = self
+        if self.data is not None:
+            self.results.put(key, {
+                'data': self.data.copy(),
+                'metadata': self.metadata[len(metadata):],
+                'attributes': {k: v for k, v in vars(self).items()
+                               if k not in attributes}})
+
+    @classmethod
+    def compute_many(cls, stocks: list, what: str, workers=None, **kwargs):
+        """Calculates `what` statistic for each of `stocks` on a process pool.
+
+        Workers get each stock's history and the parameters to rebuild it,
+        never the `Stock` itself. Deferred stocks are fetched in one batch
+        first and stocks without a history are left out. HourlyChg goes
+        through `window_changes` once per worker rather than once per stock.
+
+        Parameters:
+            stocks (list): Stock instances.
+            what (str): Statistic to calculate. See `VALID_WHATS`.
+            workers (int): Number of processes. Defaults to the number of
+                CPUs; 1 calculates everything in this process.
+            **kwargs: Informal keyword arguments. Passed to `calculate`.
+
+        Returns:
+            pd.DataFrame: `data` of each stock, in the order of `stocks`,
+            under an outer index level named 'Stock'.
+        """
+        if what not in cls.VALID_WHATS:
+            raise ValueError(f'Invalid $what={what}! Hint: {cls.VALID_WHATS}')
+
+        StockFactory.materialize(stocks)
+        items = [(stock.symbol, cls._fields(stock), stock.history)
+                 for stock in stocks if stock.history is not None]
+        # Deals the longest histories first, round-robin, so that workers get
+        # about the same number of bars.
+        items.sort(key=lambda item: len(item[2]), reverse=True)
+        workers = min(workers or os.cpu_count() or 1, len(items))
+        shares = [items[i::workers] for i in range(workers)]
+        if workers <= 1:
+            results = [cls._compute_share(what, share, kwargs)
+                       for share in shares]
+        else:
+            with cf.ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(
+                    cls._compute_share, [what] * workers, shares,
+                    [kwargs] * workers))
+
+        data = {}
+        for result in results:
+            data.update(result)
+        frames = {stock.symbol: data[stock.symbol] for stock in stocks
+                  if data.get(stock.symbol) is not None}
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, names=['Stock'])
+
+    @staticmethod
+    def _fields(stock: Stock):
+        """Returns the `Stock` parameters `compute_many` rebuilds it with."""
+        fields = {k: getattr(stock, k) for k in StockFactory.FETCH_FIELDS}
+        return dict(stock._kwargs, indicators=stock.indicators, **fields)
+
+    @classmethod
+    def _compute_share(cls, what: str, items: list, kwargs: dict):
+        """Returns {symbol: data} for `items`, (symbol, fields, history)
+        tuples as built by `compute_many`. Runs in its workers."""
+        data = {}
+        # Progress messages from many processes would only interleave.
+        with contextlib.redirect_stdout(io.StringIO()):
+            if what == 'HourlyChg':
+                windows = kwargs.get('windows', cls.HOURLY_WINDOWS)
+                for interval in {fields['interval'] for _, fields, _ in items}:
+                    data.update(cls.window_changes(
+                        {symbol: history for symbol, fields, history in items
+                         if fields['interval'] == interval},
+                        interval, windows))
+                return data
+
+            for symbol, fields, history in items:
+                stock = Stock(symbol, fetch=False, **fields)
+                stock._set_history(history, history.drop(
+                    columns=list(Collector.OHLCV), errors='ignore'))
+                data[symbol] = cls(stock, what, **kwargs).data
+        return data
 
     def _calculate_firstn(self, stock: Stock, **kwargs):
         """Calculates market-open to `n`th interval statistics.
@@ -140,40 +280,63 @@ class Statistic:
             if k == 'n':
                 n = v
 
-        h = stock.history.groupby(
-            stock.history.index.date, sort=False).head(n).dropna()
-        g = h.groupby(h.index.date, sort=False)
-
-        # Adds Event column to `h`.
-        h.loc[g['RSI'].idxmin(), 'Event'] = ''
-        h.loc[g['Low'].idxmin(), 'Event'] = ''
-        h.loc[g['RSI'].idxmax(), 'Event'] = ''
-        h.loc[g['Low'].idxmax(), 'Event'] = ''
-        h.loc[g['RSI'].idxmin(), 'Event'] += 'MinRSI '
-        h.loc[g['Low'].idxmin(), 'Event'] += 'MinPrice '
-        h.loc[g['RSI'].idxmax(), 'Event'] += 'MaxRSI '
-        h.loc[g['Low'].idxmax(), 'Event'] += 'MaxPrice '
-
-        # Makes Event column pretty.
-        h['Event'].fillna('', inplace=True)
-        h['Event'] = h['Event'].astype(str).apply(lambda s: s.strip())
-
-        # Adds %Vol column to `h`.
+        history = stock.history
+        keep = (self._opening_bars(stock, n)
+                & history.notna().all(axis=1).to_numpy())
+        h = history[keep]
+        days = stock.sessions.bar_days[keep]
+        g = h.groupby(days, sort=False)
+
+        # Adds Event column to `h`: the names of the day's extremes each row
+        # holds, looked up by a 4-bit code.
+        codes = np.zeros(len(h), dtype=np.int64)
+        extremes = [('RSI', 'min'), ('Low', 'min'),
+                    ('RSI', 'max'), ('Low', 'max')]
+        for bit, (column, extreme) in enumerate(extremes):
+            # First row of each day holding the extreme, as idxmin/idxmax.
+            hit = h[column] == g[column].transform(extreme)
+            first = hit & (hit.groupby(days, sort=False).cumsum() == 1)
+            codes[first.to_numpy()] |= 1 << bit
+        names = ['MinRSI', 'MinPrice', 'MaxRSI', 'MaxPrice']
+        events = np.array([' '.join(name for bit, name in enumerate(names)
+                                    if code >> bit & 1)
+                           for code in range(16)], dtype=object)
+
+        # Adds %Vol and %Chg columns to `h`.
         max_open_vol = g['Volume'].first().max()
-        h['%Vol'] = (h['Volume'] / max_open_vol * 100).round(2)
+        open_price = g['Open'].transform('first')
+        h = h.assign(
+            Event=events[codes],
+            **{'%Vol': (h['Volume'] / max_open_vol * 100).round(2),
+               '%Chg': ((h['Low'] - open_price) / open_price * 100).round(2)})
+
+        # Removes excess data, keeping the first of any repeated timestamp.
+        wall = stock.sessions.wall[keep]
+        first = np.append(True, wall[1:] != wall[:-1])
+        h = h.loc[first, ['Event', '%Vol', 'RSI', '%Chg']]
+        h.index = pd.MultiIndex.from_arrays(
+            [pd.to_datetime(days[first] * Sessions.DAY).date,
+             pd.to_datetime(wall[first] % Sessions.DAY).time],
+            names=['Date', 'Time'])
 
-        # Adds %Chg column to `h`.
-        for i, df in g:
-            open_price = df['Open'].iloc[0]
-            h.loc[df.index, '%Chg'] = (
-                    (df['Low'] - open_price) / open_price * 100).round(2)
+        return h
 
-        # Removes excess data.
-        h = h[['Event', '%Vol', 'RSI', '%Chg']]
-        h = h.groupby([h.index.date, h.index.time], sort=False).first()
-        h.index.set_names(['Date', 'Time'], inplace=True)
+    @staticmethod
+    def _opening_bars(stock: Stock, n: int):
+        """Returns a mask of the bars within `n` intervals of each session's
+        open.
 
-        return h
+        Intraday bars are located against `MarketCalendar`, so missing bars
+        don't pull later ones in and prepost bars are left out. Other
+        intervals take the first `n` bars of each day.
+        """
+        sessions = stock.sessions
+        if not re.match(r'[0-9]+[mh]$', stock.interval):
+            return sessions.first(n)
+        step = utils.interval2timedelta(stock.interval).value
+        opens, _ = MarketCalendar.bounds(sessions.bar_days)
+        return (MarketCalendar.mask(sessions.wall)
+                & (sessions.wall - opens < n * step))
 
     def _calculate_volrsi(self, stock: Stock):
         """Calculates RSI profitability statistics.
@@ -197,9 +360,9 @@ class Statistic:
         self.metadata += f'Period: {stock.period}\n'
         self.metadata += f'Interval: {stock.interval}\n'
 
-        h = stock.history.dropna().copy()
+        keep = stock.history.notna().all(axis=1).to_numpy()
+        h = stock.history[keep].copy()
         h['RSI'] = h['RSI'].round(0).astype(int)
-        g = h.groupby(h.index.date, sort=False)
 
         # Adds VolLvl column to `h`.
         q1 = int(h['Volume'].quantile(q=0.80))
@@ -212,28 +375,7 @@ class Statistic:
         self.metadata += f'Medium Vol: {q1} < Vol < {q2}\n'
         self.metadata += f'High Vol: Vol >= {q2}\n'
 
-        def func(df: pd.DataFrame):
-            """Returns `df` plus %Chg, %Neg, %Pos, %Gain, %Loss columns."""
-            rsi_min = df['RSI'].min()
-            rsi_max = df['RSI'].max()
-            for rsi in range(rsi_min, rsi_max + 1):
-                idx = df[df.RSI == rsi].first_valid_index()
-                if idx is None:
-                    continue
-                price = df.loc[idx, 'Low']
-                sub = df.loc[idx:]
-                sub['%Chg'] = ((sub['Low'] - price) / price * 100).round(2)
-                df.loc[idx, '%Neg'] = round(
-                    len(sub['%Chg'][sub['%Chg'] <= 0]) / len(sub) * 100, 2)
-                df.loc[idx, '%Pos'] = round(
-                    len(sub['%Chg'][sub['%Chg'] > 0]) / len(sub) * 100, 2)
-                df.loc[idx, '%Loss'] = round(
-                    sub['%Chg'][sub['%Chg'] <= 0].min(), 2)
-                df.loc[idx, '%Gain'] = round(
-                     sub['%Chg'][sub['%Chg'] > 0].max(), 2)
-            return df
-
-        h = g.apply(func).dropna()
+        h = self._forward_outcomes(h, stock.sessions.bar_days[keep])
 
         result = pd.DataFrame(
             index=pd.MultiIndex.from_product(
@@ -275,32 +417,11 @@ class Statistic:
         self.metadata += f'Period: {stock.period}\n'
         self.metadata += f'Interval: {stock.interval}\n'
 
-        h = stock.history.dropna().copy()
+        keep = stock.history.notna().all(axis=1).to_numpy()
+        h = stock.history[keep].copy()
         h['RSI'] = h['RSI'].round(0).astype(int)
-        g = h.groupby(h.index.date, sort=False)
-
-        def func(df: pd.DataFrame):
-            """Returns `df` plus %Chg, %Neg, %Pos, %Gain, %Loss columns."""
-            rsi_min = df['RSI'].min()
-            rsi_max = df['RSI'].max()
-            for rsi in range(rsi_min, rsi_max + 1):
-                idx = df[df.RSI == rsi].first_valid_index()
-                if idx is None:
-                    continue
-                price = df.loc[idx, 'Low']
-                sub = df.loc[idx:]
-                sub['%Chg'] = ((sub['Low'] - price) / price * 100).round(2)
-                df.loc[idx, '%Neg'] = round(
-                    len(sub['%Chg'][sub['%Chg'] <= 0]) / len(sub) * 100, 2)
-                df.loc[idx, '%Pos'] = round(
-                    len(sub['%Chg'][sub['%Chg'] > 0]) / len(sub) * 100, 2)
-                df.loc[idx, '%Loss'] = round(
-                    sub['%Chg'][sub['%Chg'] <= 0].min(), 2)
-                df.loc[idx, '%Gain'] = round(
-                     sub['%Chg'][sub['%Chg'] > 0].max(), 2)
-            return df
-
-        h = g.apply(func).dropna()
+
+        h = self._forward_outcomes(h, stock.sessions.bar_days[keep])
 
         result = pd.DataFrame(
             index=sorted(h['RSI'].drop_duplicates()),
@@ -319,6 +440,65 @@ class Statistic:
 
         return result
 
+    @staticmethod
+    def _forward_outcomes(h: pd.DataFrame, days=None):
+        """Returns the rows where each day first reaches each RSI value, plus
+        %Neg, %Pos, %Loss and %Gain columns.
+
+        For each such row, %Chg is the rounded change of 'Low' from that row
+        to every later row of the same day, itself included. %Neg and %Pos
+        are the shares of those changes that are <= 0 and > 0, %Loss the
+        lowest and %Gain the highest. Rows with no gain are left out.
+
+        Runs in linear time: %Loss and %Gain come from each day's reverse
+        running min/max of 'Low', and %Neg/%Pos from (row, later row) pairs,
+        of which there are at most 101 (one per RSI value) per bar.
+
+        Args:
+            h (pd.DataFrame): History without NaNs, its RSI rounded to int.
+            days (np.ndarray): Day number of each row of `h`, e.g. from
+                `Stock.sessions`. Derived from `h.index` if not given.
+        """
+        low = h['Low'].to_numpy(dtype=np.float64)
+        if days is None:
+            days = Sessions.from_index(h.index).bar_days
+
+        # Rows where each day first reaches each RSI value.
+        rows = np.flatnonzero(~pd.DataFrame(
+            {'Day': days, 'RSI': h['RSI'].to_numpy()}).duplicated())
+        price = low[rows]
+
+        # Lowest and highest 'Low' from each row to the end of its day.
+        reverse = pd.Series(low[::-1])
+        lowest = reverse.groupby(days[::-1]).cummin().to_numpy()[::-1][rows]
+        highest = reverse.groupby(days[::-1]).cummax().to_numpy()[::-1][rows]
+
+        # Pairs each row with the rest of its day.
+        day_ends = np.flatnonzero(np.append(days[1:] != days[:-1], True)) + 1
+        lengths = day_ends[np.searchsorted(day_ends, rows, 'right')] - rows
+        offsets = np.cumsum(lengths) - lengths
+        later = (np.arange(lengths.sum()) - np.repeat(offsets, lengths)
+                 + np.repeat(rows, lengths))
+        start = np.repeat(price, lengths)
+        changes = ((low[later] - start) / start * 100).round(2)
+        pos = (np.add.reduceat((changes > 0).astype(np.int64), offsets)
+               if len(rows)
+               else np.empty(0, dtype=np.int64))
+        neg = lengths - pos
+
+        loss = ((lowest - price) / price * 100).round(2)
+        gain = ((highest - price) / price * 100).round(2)
+        gain = np.where(gain > 0, gain, np.nan)
+
+        h = h.iloc[rows].copy()
+        h['%Neg'] = [round(k / n * 100, 2)
+                     for k, n in zip(neg.tolist(), lengths.tolist())]
+        h['%Pos'] = [round(k / n * 100, 2)
+                     for k, n in zip(pos.tolist(), lengths.tolist())]
+        h['%Loss'] = loss
+        h['%Gain'] = gain
+        return h.dropna()
+
     def _calculate_gobo(self, stock: Stock, **kwargs):
         """Calculates %Chg per open avg_volume for good and bad days.
 
@@ -347,32 +527,46 @@ class Statistic:
             if k == 'n':
                 n = v
 
-        h = stock.history.dropna().copy()
-        h = h.groupby(h.index.date, sort=False).head(n)
-        g = h.groupby(h.index.date, sort=False)
-
-        def func(df: pd.DataFrame):
-            """Adds OpenIs, OpenVol %Down and %Up columns to `df`."""
-            # Sets OpenIs column.
-            if df['Close'].pct_change().mean() > 0:
-                df['OpenIs'] = 'Good'
-            else:
-                df['OpenIs'] = 'Bad'
-
-            # Sets OpenVol column.
-            df['OpenVol'] = df.iloc[0]['Volume'].astype(int)
-            df['%Down'] = df['Low'][1:].min() - df['Low'][0]
-            df['%Up'] = df['Low'][1:].max() - df['Low'][0]
-            return df
-
-        h = g.apply(func)
-        h = h[['OpenIs', 'OpenVol', '%Down', '%Up']].drop_duplicates('OpenVol')
-        h.sort_values(['OpenIs', 'OpenVol'], inplace=True)
-        h.set_index(['OpenIs', 'OpenVol'], inplace=True)
+        history = stock.history
+        keep = history.notna().all(axis=1).to_numpy()
+        sessions = stock.sessions.take(keep)
+        first = sessions.first(n)
+        h = history[keep][first]
+        days = sessions.bar_days[first]
+        g = h.groupby(days, sort=False)
+
+        # One row per day. A day's open is good if its average price change
+        # is positive; %Down and %Up compare its later lows to the first.
+        avg_chg = g['Close'].pct_change().groupby(days, sort=False).mean()
+        later_lows = h['Low'].where(g.cumcount() > 0).groupby(days, sort=False)
+        open_low = g['Low'].first()
+        h = pd.DataFrame({
+            'OpenIs': np.where(avg_chg > 0, 'Good', 'Bad').astype(object),
+            'OpenVol': g['Volume'].first().astype(int),
+            '%Down': later_lows.min() - open_low,
+            '%Up': later_lows.max() - open_low})
+
+        h = h.drop_duplicates('OpenVol')
+        h = h.sort_values(['OpenIs', 'OpenVol'])
+        h = h.set_index(['OpenIs', 'OpenVol'])
         return  h
 
 
-    def _calculate_hourlychg(self, stock: Stock):
+    def _calculate_hourlychg(self, stock: Stock, **kwargs):
+        """Calculates the daily %Chg of 'Low' within time windows.
+
+        Args:
+            stock (Stock): Stock instance with non-empty intraday `history`.
+            **kwargs: Informal keyword arguments. The following are parsed:
+                windows (list): (start, end) times such as ('9:30', '10:30'),
+                    both inclusive. Defaults to `HOURLY_WINDOWS`.
+
+        Returns:
+            pd.DataFrame: Data for assessing intraday swings.
+
+            index: Date
+            columns: %Chg1, %Chg2, ..., Volume
+        """
         print('Calculating HourlyChg...')
 
         self.metadata += f'Symbol: {stock.symbol}\n'
@@ -380,84 +574,131 @@ class Statistic:
         self.metadata += f'Interval: {stock.interval}\n'
 
         # Defaults.
-        if stock.interval == '1m':
-            n = 181
-            n_per_hr = 60
-        elif stock.interval == '2m':
-            n = 91
-            n_per_hr = 30
-        elif stock.interval == '5m':
-            n = 37
-            n_per_hr = 12
-        elif stock.interval == '10m':
-            n = 19
-            n_per_hr = 6
-        elif stock.interval == '15m':
-            n = 13
-            n_per_hr = 4
-        elif stock.interval == '30m':
-            n = 7
-            n_per_hr = 2
-        elif stock.interval == '60m':
-            n = 4
-            n_per_hr = 1
-
-        h = stock.history.groupby(stock.history.index.date, sort=False).head(n)
-        g = h.groupby(h.index.date, sort=False)
-
-        # Initialize result-holding vars.
-        dates = []
-        hourly_pct_chg_1 = []
-        hourly_pct_chg_2 = []
-        hourly_pct_chg_3 = []
-        vol_cumm = []
-
-        # Calculate hourly_pct_chg and vol_cumm.
-        for dt, df in g:
-            dates.append(dt)
-
-            start = 0
-            end = n_per_hr + 1
-            low_min = df['Low'][start:end].min()
-            low_max = df['Low'][start:end].max()
-            hourly_pct_chg_1.append(abs(1 - low_max / low_min) * 100)
-
-            start = end - 1
-            end = end + n_per_hr + 1
-            low_min = df['Low'][start:end].min()
-            low_max = df['Low'][start:end].max()
-            hourly_pct_chg_2.append(abs(1 - low_max / low_min) * 100)
-
-            start = end - 1
-            end = end + n_per_hr + 1
-            low_min = df['Low'][start:end].min()
-            low_max = df['Low'][start:end].max()
-            hourly_pct_chg_3.append(abs(1 - low_max / low_min) * 100)
-
-            vol_cumm.append(df['Volume'][0:end].sum())
-
-        # Return result as Dataframe.
-        result = pd.DataFrame(
-            index=dates,
-            data={'%Chg1': hourly_pct_chg_1,
-                  '%Chg2': hourly_pct_chg_2,
-                  '%Chg3': hourly_pct_chg_3,
-                  'Volume': vol_cumm
-            })
-        result = result.round(2)
+        windows = self.HOURLY_WINDOWS
+
+        # Parses `kwargs`.
+        for k, v in kwargs.items():
+            if k == 'windows':
+                windows = v
+
+        result = self.window_changes(
+            {stock.symbol: stock.history}, stock.interval, windows,
+            {stock.symbol: stock.sessions})[stock.symbol]
 
         # Add additional metadata.
-        self.hourly_pct_chg_1 = result['%Chg1'].mean().round(2)
-        self.hourly_pct_chg_2 = result['%Chg2'].mean().round(2)
-        self.hourly_pct_chg_3 = result['%Chg3'].mean().round(2)
+        for i in range(1, len(windows) + 1):
+            setattr(self, f'hourly_pct_chg_{i}',
+                    result[f'%Chg{i}'].mean().round(2))
         self.avg_volume = result['Volume'].mean().astype(int)
-        self.metadata += f"Avg %Chg1: {self.hourly_pct_chg_1}\n"
-        self.metadata += f"Avg %Chg2: {self.hourly_pct_chg_2}\n"
-        self.metadata += f"Avg %Chg3: {self.hourly_pct_chg_3}\n"
+        for i in range(1, len(windows) + 1):
+            self.metadata += (f"Avg %Chg{i}: "
+                              f"{getattr(self, f'hourly_pct_chg_{i}')}\n")
         self.metadata += f"Avg Volume: {self.avg_volume}\n"
 
         return result
 
+    @staticmethod
+    def window_changes(histories: dict, interval: str, windows: list,
+                       sessions=None):
+        """Calculates the daily %Chg of 'Low' within `windows` for many stocks.
+
+        Bars of all `histories` are laid out in one (stock-days x slots)
+        array, where slot k holds the bar at `interval` * k after the first
+        window start. Each window is then a range of columns, reduced for all
+        days of all stocks at once. Bars off that grid or outside market
+        sessions are ignored, and windows running past a day's close (see
+        `MarketCalendar.early_closes`) are NaN.
+
+        Parameters:
+            histories (dict): keys=symbols, values=intraday pd.DataFrame as
+                returned by `Collector.get_history`. None values are skipped.
+            interval (str): Interval of the histories.
+            windows (list): (start, end) times such as ('9:30', '10:30'), both
+                inclusive.
+            sessions (dict): keys=symbols, values=`Sessions` of the histories,
+                e.g. from `Stock.sessions`. Saves converting their timestamps.
+
+        Returns:
+            dict: keys=symbols, values=pd.DataFrame with index=Date,
+            columns=%Chg1|%Chg2|...|Volume, where Volume is traded from the
+            first window start to the last window end.
+        """
+        start, step, slots, ranges = Statistic._window_layout(
+            interval, tuple(tuple(window) for window in windows))
+        histories = {symbol: history for symbol, history in histories.items()
+                     if history is not None and not history.empty}
+        if not histories:
+            return {}
+
+        # Locates every bar in the grid.
+        day_ns = Sessions.DAY
+        sessions = sessions or {}
+        wall = np.concatenate([
+            sessions[symbol].wall if sessions.get(symbol) is not None
+            else history.index.tz_localize(None).asi8
+            for symbol, history in histories.items()])
+        stock = np.repeat(np.arange(len(histories)),
+                          [len(history) for history in histories.values()])
+        offset = wall % day_ns - start
+        slot = offset // step
+        keep = ((offset >= 0) & (offset % step == 0) & (slot < slots)
+                & MarketCalendar.mask(wall))
+        # Histories are sorted, so each stock-day is a run of bars.
+        stock, day, slot = stock[keep], wall[keep] // day_ns, slot[keep]
+        new = np.ones(len(day), dtype=bool)
+        new[1:] = (stock[1:] != stock[:-1]) | (day[1:] != day[:-1])
+        row = np.cumsum(new) - 1
+        stock, day = stock[new], day[new]
+        _, closes = MarketCalendar.bounds(day)
+        last_slot = (closes - day * day_ns - start) // step
+
+        def grid(column: str):
+            values = np.concatenate([history[column].to_numpy(dtype=float)
+                                     for history in histories.values()])
+            array = np.full((len(day), slots), np.nan)
+            array[row, slot] = values[keep]
+            return array
+
+        low = grid('Low')
+        data = {}
+        for i, (first, last) in enumerate(ranges, 1):
+            low_min = np.fmin.reduce(low[:, first:last + 1], axis=1)
+            low_max = np.fmax.reduce(low[:, first:last + 1], axis=1)
+            data[f'%Chg{i}'] = np.where(
+                last <= last_slot, np.abs(1 - low_max / low_min) * 100, np.nan)
+        data['Volume'] = np.nansum(grid('Volume'), axis=1)
+
+        result = pd.DataFrame(data).round(2)
+        dates = pd.to_datetime(day * day_ns).date
+        changes = {}
+        for i, (symbol, history) in enumerate(histories.items()):
+            rows = stock == i
+            changes[symbol] = result[rows].set_axis(dates[rows]).astype(
+                {'Volume': history['Volume'].dtype})
+        return changes
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _window_layout(interval: str, windows: tuple):
+        """Returns (start, step, slots, ranges) for `window_changes`.
+
+        `start` is the first window start and `step` the bar length, both in
+        nanoseconds, `slots` the number of slots up to the last window end and
+        `ranges` the (first, last) slot of each window.
+        """
+        if not re.match(r'[0-9]+[mh]$', interval):
+            raise ValueError(f'interval={interval} is not intraday!')
+        step = utils.interval2timedelta(interval).value
+        bounds = [[pd.Timedelta(f'{time}:00' if str(time).count(':') == 1
+                                else str(time)).value for time in window]
+                  for window in windows]
+        start = min(lo for lo, _ in bounds)
+        slots = (max(hi for _, hi in bounds) - start) // step + 1
+        # Slots whose bar opens within each window.
+        ranges = [(-(-(lo - start) // step), (hi - start) // step)
+                  for lo, hi in bounds]
+        return start, step, slots, ranges
+
 
 if __name__ == '__main__':
     pass
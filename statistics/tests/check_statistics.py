@@ -11,6 +11,10 @@ Checks statistics module.
 --- Copyright (C) 2020 Hank Adler ---
 """
 
+import time
+
+import pandas as pd
+
 import config, utils
 from stocks import Stock, StockFactory
 from statistics import Statistic
@@ -60,7 +64,111 @@ def check_hourlychg():
         print(f"HourlyChg statistics written to '{path}'.")
 
 
+def check_window_changes():
+    windows = [('9:30', '10:00'), ('10:00', '11:00'), ('15:00', '16:00')]
+    t0 = time.perf_counter()
+    changes = Statistic.window_changes(
+        {stock.symbol: stock.history for stock in stocks}, stocks[0].interval,
+        windows)
+    elapsed = time.perf_counter() - t0
+    for symbol, result in changes.items():
+        print(f'--- {symbol} ---\n{result.mean().round(2)}\n')
+    print(f'{len(changes)} stocks in {elapsed * 1e3:.0f} ms')
+
+
+def check_compute_many():
+    for what in ['HourlyChg', 'SimpleRSI']:
+        t0 = time.perf_counter()
+        data = Statistic.compute_many(stocks, what, workers=4)
+        elapsed = time.perf_counter() - t0
+        print(f'--- {what} ---\n{data}\n')
+        print(f'{data.index.get_level_values("Stock").nunique()} stocks in '
+              f'{elapsed:.2f}s')
+
+
+def check_lazy_period():
+    """Lazy stocks whose period isn't in `Collector.VALID_PERIODS` are
+    fetched with that period as is."""
+    for stock in [Stock('PLTR', period='5d', indicators='RSI', window=60,
+                        lazy=True),
+                  *StockFactory.create('PLTR', period='1mo', interval='1d',
+                                       indicators='RSI', window=14,
+                                       lazy=True)]:
+        stat = Statistic(stock, what='SimpleRSI')
+        print(f"period='{stock.period}': {len(stat.stock.history)} bars\n")
+
+
+def check_result_cache():
+    stock = Stock('PLTR', indicators='RSI', window=60)
+    for label in ['miss', 'hit']:
+        t0 = time.perf_counter()
+        stat = Statistic(stock, what='VolRSI')
+        print(f'{label}: {time.perf_counter() - t0:.3f}s, '
+              f'data shape {stat.data.shape}')
+    print(f'Results: {Statistic.results.stats()}\n')
+
+
+def legacy_forward_outcomes(h: pd.DataFrame):
+    """Reference for `Statistic._forward_outcomes`: the quadratic per-day scan
+    SimpleRSI and VolRSI used before."""
+    g = h.groupby(h.index.date, sort=False)
+
+    def func(df: pd.DataFrame):
+        """Returns `df` plus %Chg, %Neg, %Pos, %Gain, %Loss columns."""
+        rsi_min = df['RSI'].min()
+        rsi_max = df['RSI'].max()
+        for rsi in range(rsi_min, rsi_max + 1):
+            idx = df[df.RSI == rsi].first_valid_index()
+            if idx is None:
+                continue
+            price = df.loc[idx, 'Low']
+            sub = df.loc[idx:]
+            sub['%Chg'] = ((sub['Low'] - price) / price * 100).round(2)
+            df.loc[idx, '%Neg'] = round(
+                len(sub['%Chg'][sub['%Chg'] <= 0]) / len(sub) * 100, 2)
+            df.loc[idx, '%Pos'] = round(
+                len(sub['%Chg'][sub['%Chg'] > 0]) / len(sub) * 100, 2)
+            df.loc[idx, '%Loss'] = round(
+                sub['%Chg'][sub['%Chg'] <= 0].min(), 2)
+            df.loc[idx, '%Gain'] = round(
+                 sub['%Chg'][sub['%Chg'] > 0].max(), 2)
+        return df
+
+    return g.apply(func).dropna()
+
+
+def check_forward_outcomes():
+    stock = Stock('PLTR', period='5d', interval='1m', indicators='RSI',
+                  window=60)
+    h = stock.history.dropna().copy()
+    h['RSI'] = h['RSI'].round(0).astype(int)
+
+    t0 = time.perf_counter()
+    expected = legacy_forward_outcomes(h.copy())
+    t1 = time.perf_counter()
+    actual = Statistic._forward_outcomes(h.copy())
+    t2 = time.perf_counter()
+    print(f'Matches legacy scan: {actual.equals(expected[actual.columns])} '
+          f'({(t1 - t0) * 1e3:.0f} ms -> {(t2 - t1) * 1e3:.0f} ms)')
+
+    for what in ['SimpleRSI', 'VolRSI']:
+        actual = Statistic(stock, what=what).data
+        forward_outcomes = Statistic.__dict__['_forward_outcomes']
+        Statistic._forward_outcomes = staticmethod(
+            lambda h, days=None: legacy_forward_outcomes(h))
+        try:
+            expected = Statistic(stock, what=what).data
+        finally:
+            Statistic._forward_outcomes = forward_outcomes
+        print(f'{what} matches legacy table: {actual.equals(expected)}')
+
+
 if __name__ == '__main__':
+    # check_window_changes()
+    # check_compute_many()
+    # check_lazy_period()
+    # check_result_cache()
+    # check_forward_outcomes()
     # check_firstn()
     # check_volrsi()
     # check_simplersi()
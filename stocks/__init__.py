@@ -1 +1,2 @@
+from .sessions import *
 from .stocks import *
@@ -0,0 +1,102 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""--- sessions.py ---
+
+Index of the trading days (sessions) in a price history.
+
+@author   Hank Adler
+@version  0.1.0
+@license  MIT
+
+--- Copyright (C) 2020 Hank Adler ---
+"""
+
+
+import numpy as np
+import pandas as pd
+
+
+class Sessions:
+    """Row offsets of the sessions in a history, which is assumed sorted.
+
+    Lets callers slice a session or take its first n bars without grouping
+    the history by date.
+
+    Args:
+        wall (np.ndarray): Wall-clock time of each bar as int64 nanoseconds,
+            i.e. the history's timestamps with their time zone dropped.
+
+    Attributes:
+        DAY (int): Nanoseconds in a day.
+        wall (np.ndarray): Wall-clock time of each bar.
+        days (np.ndarray): Day number (days since epoch) of each session.
+        starts (np.ndarray): Row offset of the first bar of each session.
+        ends (np.ndarray): Row offset past the last bar of each session.
+        day_of_bar (np.ndarray): Session number of each bar.
+        bar_of_day (np.ndarray): Position of each bar within its session.
+    """
+    DAY = 86_400_000_000_000
+
+    def __init__(self, wall: np.ndarray):
+        self.wall = wall
+        bar_days = wall // self.DAY
+        new = np.ones(len(wall), dtype=bool)
+        new[1:] = bar_days[1:] != bar_days[:-1]
+        self.starts = np.flatnonzero(new)
+        self.ends = np.append(self.starts[1:], len(wall))
+        self.days = bar_days[self.starts]
+        self.day_of_bar = np.cumsum(new) - 1
+        self.bar_of_day = (np.arange(len(wall))
+                           - self.starts[self.day_of_bar])
+
+    @classmethod
+    def from_index(cls, index: pd.DatetimeIndex, previous=None, offset=0,
+                   shared=0):
+        """Returns the sessions of `index`.
+
+        Parameters:
+            index (pd.DatetimeIndex): History index.
+            previous (Sessions): Sessions of a previous history whose rows from
+                `offset` on equal the first `shared` rows of `index`. Their
+                wall-clock times are reused, so only appended rows are
+                converted. See `Stock._shared_rows`.
+        """
+        if previous is None or not shared:
+            return cls(index.tz_localize(None).asi8)
+        return cls(np.concatenate((
+            previous.wall[offset:offset + shared],
+            index[shared:].tz_localize(None).asi8)))
+
+    def __len__(self):
+        return len(self.starts)
+
+    @property
+    def bar_days(self):
+        """Day number of each bar."""
+        return self.days[self.day_of_bar]
+
+    @property
+    def time_of_day(self):
+        """Nanoseconds since midnight of each bar."""
+        return self.wall % self.DAY
+
+    @property
+    def dates(self):
+        """Date of each session as datetime.date objects."""
+        return pd.to_datetime(self.days * self.DAY).date
+
+    def session(self, i: int):
+        """Returns the rows of session `i` as a slice."""
+        return slice(self.starts[i], self.ends[i])
+
+    def first(self, n: int):
+        """Returns a mask of the first `n` bars of every session."""
+        return self.bar_of_day < n
+
+    def take(self, mask: np.ndarray):
+        """Returns the sessions of the rows selected by `mask`."""
+        return Sessions(self.wall[mask])
+
+
+if __name__ == '__main__':
+    pass
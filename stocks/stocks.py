@@ -12,11 +12,15 @@ An equity security that represents fractional ownership of a company.
 """
 
 
+import asyncio
+import functools
+
+import numpy as np
 import pandas as pd
 
-import args2fields as a2f
 from collector import Collector
-from indicators import Indicators
+from indicators import BatchIndicators, IndicatorEngine
+from .sessions import Sessions
 
 
 class Stock:
@@ -24,7 +28,7 @@ class Stock:
             self, symbol: str, period='60d',
             interval=Collector.DEFAULT_INTERVALS['60d'],
             start: str = None, end: str = None, source=Collector.SOURCES[0],
-            indicators=[], **kwargs):
+            indicators=[], fetch=True, lazy=False, **kwargs):
         """
         Parameters:
             symbol (str): Stock symbol.
@@ -34,9 +38,16 @@ class Stock:
             end (str): Date indicating period end.
             source (str): Data source. See `Collector.SOURCES`.
             indicators (list): Names of indicators_remaining to add to `history`.
+                Any name in `IndicatorEngine.registry`, e.g. 'RSI'.
+            fetch (bool): Whether to fetch `history` right away. Pass False
+                when `history` will be assigned by the caller.
+            lazy (bool): Whether to defer fetching `history` until it is
+                first accessed. Overrides `fetch`.
         """
         self._kwargs = kwargs
         self._history = None
+        self._sessions = None
+        self._loader = None
 
         self.symbol = symbol
         self.period = period
@@ -48,53 +59,303 @@ class Stock:
             indicators = indicators.split()
         self.indicators = indicators
 
-        self.refresh()
+        if lazy:
+            self._loader = self.refresh
+        elif fetch:
+            self.refresh()
 
     """history (df): index=Datetime, columns=Open|High|Low|Close|Volume"""
     @property
     def history(self):
+        if self._loader is not None:
+            self._loader()
         return self._history
     @history.setter
     def history(self, value):
+        self._set_history(value)
+
+    # @Helper
+    def _set_history(self, value: pd.DataFrame, computed: pd.DataFrame = None):
+        """Sets `history` to `value`. See `_on_set_history` for `computed`."""
+        self._loader = None
+        previous = self._history
         if isinstance(value, pd.DataFrame):
             self._history = value
-            self._on_set_history()
+            self._on_set_history(previous, computed)
         else:
             self._history = None
+            self._sessions = None
+
+    @property
+    def sessions(self):
+        """sessions (Sessions): Session index of `history`, kept up to date
+        whenever `history` is set. None if `history` is."""
+        if self._loader is not None:
+            self._loader()
+        return self._sessions
+
+    # @Helper
+    def _on_set_history(self, previous: pd.DataFrame = None,
+                        computed: pd.DataFrame = None):
+        """Indexes the sessions of `history` and adds its indicator columns.
+
+        Rows `history` shares with `previous` keep their session offsets and
+        indicator values, so a refresh only computes the rows appended since.
+        Indicators without a lookback (see `IndicatorEngine.register`) are
+        recomputed in full.
+
+        Parameters:
+            previous (pd.DataFrame): History replaced by the current one.
+            computed (pd.DataFrame): Indicator columns already computed for
+                `history`, e.g. by `BatchIndicators`. These are used as is.
+        """
+        if computed is not None:
+            for column in computed:
+                self._history[column] = computed[column]
+            done = set(computed.columns)
+        else:
+            done = set()
+
+        offset, shared = self._shared_rows(previous)
+        self._sessions = Sessions.from_index(
+            self._history.index, self._sessions if previous is not None
+            else None, offset, shared)
+
+        engine = [indicator.upper() for indicator in self.indicators
+                  if indicator.upper() in IndicatorEngine.registry
+                  and not set(IndicatorEngine.registry[
+                      indicator.upper()][1]) <= done]
+
+        # Computes engine indicators in as few passes as possible: one over
+        # the appended rows for those with a lookback, one over all rows for
+        # the rest.
+        lookbacks = {name: IndicatorEngine.lookback(name, **self._kwargs)
+                     for name in engine}
+        windowed = {column: lookbacks[name] for name in engine
+                    if lookbacks[name] is not None
+                    for column in IndicatorEngine.registry[name][1]}
+        full = [column for name in engine if lookbacks[name] is None
+                for column in IndicatorEngine.registry[name][1]]
+        for columns, lookback in [(list(windowed), windowed), (full, None)]:
+            if not columns:
+                continue
+            names = [name for name in engine
+                     if set(IndicatorEngine.registry[name][1]) & set(columns)]
+            columns = self._extend(
+                previous, columns, offset, shared, lookback,
+                lambda history: IndicatorEngine.compute(
+                    history, names, **self._kwargs))
+            for column, values in columns.items():
+                self._history[column] = values
 
     # @Helper
-    def _on_set_history(self):
-        for indicator in self.indicators:
-            if indicator.upper() == 'RSI':
-                # Parses `kwargs` for any required field.
-                fields = {'window': int}
-                defaults = {'window': 60}
-                a2f.args2fields(self, fields, defaults=defaults, **self._kwargs)
-
-                # Adds RSI column to `history`.
-                rsi = Indicators.RSI(self.history['Low'], self.window)
-                self._history['RSI'] = rsi
-
-    def refresh(self):
+    def _shared_rows(self, previous: pd.DataFrame):
+        """Returns (offset, n) such that the first n rows of `history` equal
+        `previous` rows from `offset` on.
+
+        All shared rows are compared, so revised bars (e.g. split-adjusted
+        prices) are caught and recomputed.
+        """
+        if previous is None or previous.empty:
+            return 0, 0
+        offset = previous.index.searchsorted(self._history.index[0])
+        n = min(len(previous) - offset, len(self._history))
+        equal = (previous.index[offset:offset + n]
+                 == self._history.index[:n])
+        for column in Collector.OHLCV:
+            if column in previous:
+                equal &= (previous[column].to_numpy()[offset:offset + n]
+                          == self._history[column].to_numpy()[:n])
+        return offset, n if equal.all() else int(equal.argmin())
+
+    # @Helper
+    def _extend(self, previous: pd.DataFrame, columns: list, offset: int,
+                shared: int, lookback: any, compute):
+        """Returns {column: pd.Series} for `history`, reusing `previous` values.
+
+        Parameters:
+            previous (pd.DataFrame): History replaced by the current one.
+            columns (list): Indicator columns.
+            offset, shared (int): See `_shared_rows`.
+            lookback (int|dict): Number of prior bars each value depends on,
+                either for all `columns` or by column. None to always compute
+                in full.
+            compute (callable): Computes {column: pd.Series} from a history.
+        """
+        history = self._history
+        if lookback is None:
+            lookbacks = None
+        elif isinstance(lookback, dict):
+            lookbacks = lookback
+        else:
+            lookbacks = dict.fromkeys(columns, lookback)
+        if (lookbacks is None or previous is None
+                or shared <= max(lookbacks.values())
+                or any(column not in previous for column in columns)):
+            computed = compute(history)
+            return {column: computed[column] for column in columns}
+
+        context = max(lookbacks.values())
+        tail = compute(history.iloc[shared - context:])
+        extended = {}
+        for column in columns:
+            values = np.empty(len(history))
+            values[:shared] = previous[column].to_numpy()[
+                offset:offset + shared]
+            # Rows whose lookback was cut off by a later start have no value.
+            values[:lookbacks[column]] = np.nan
+            values[shared:] = tail[column].to_numpy()[context:]
+            extended[column] = pd.Series(values, index=history.index,
+                                         name=column)
+        return extended
+
+    @property
+    def loaded(self):
+        """loaded (bool): False while `history` is still deferred."""
+        return self._loader is None
+
+    def refresh(self, period: str = None):
+        """Fetches `history` again. `period` overrides that of the stock for
+        this fetch only."""
         self.history = Collector.get_history(
-            self.symbol, self.period, self.interval, self.start, self.end,
-            self.source)
+            self.symbol, period or self.period, self.interval, self.start,
+            self.end, source=self.source)
 
 
 class StockFactory:
+    """Creates Stock instances in bulk.
+
+    Attributes:
+        FETCH_FIELDS (list): `Stock` parameters forwarded to the collector.
+        failures (dict): Exceptions raised while fetching the histories of the
+            last `create` or `acreate` call, keyed by symbol.
+    """
+    FETCH_FIELDS = ['period', 'interval', 'start', 'end', 'source']
+    failures = {}
+
     @classmethod
-    def create(cls, symbols: any, **kwargs):
+    def create(cls, symbols: any, workers=Collector.MAX_WORKERS, lazy=False,
+               **kwargs):
         """Returns a list of Stock instances created from `symbols`.
 
+        Histories are fetched concurrently through `Collector.get_histories`.
+        Stocks whose history couldn't be fetched have `history` set to None
+        and their error recorded in `failures`.
+
         Parameters:
             symbols (any -> list): Stocks symbols.
+            workers (int): Max number of concurrent fetches.
+            lazy (bool): Whether to return stocks right away and defer the
+                fetch until any of them has its `history` accessed. All the
+                stocks still pending are then fetched together. See
+                `materialize`.
+            **kwargs: Passed to `Stock`.
         """
+        symbols = cls._parse_symbols(symbols)
+        if lazy:
+            stocks = [Stock(symbol, fetch=False, **kwargs)
+                      for symbol in symbols]
+            loader = functools.partial(cls.materialize, stocks, workers)
+            for stock in stocks:
+                stock._loader = loader
+            return stocks
+
+        fields = {k: v for k, v in kwargs.items() if k in cls.FETCH_FIELDS}
+        histories, cls.failures = Collector.get_histories(
+            symbols, workers=workers, **fields)
+        return cls._build(symbols, histories, **kwargs)
+
+    @classmethod
+    async def acreate(
+            cls, symbols: any, max_in_flight=Collector.MAX_IN_FLIGHT,
+            workers=None, **kwargs):
+        """Async counterpart of `create`.
+
+        Histories are fetched through `Collector.aget_histories`, and the
+        stocks (and their indicators) are built on the event loop's default
+        executor so the loop is never blocked.
+
+        Parameters:
+            symbols (any -> list): Stocks symbols.
+            max_in_flight (int): Max number of requests in flight.
+            workers (int): Number of threads doing the blocking work.
+                See `Collector.aget_histories`.
+            **kwargs: Passed to `Stock`.
+        """
+        symbols = cls._parse_symbols(symbols)
+        fields = {k: v for k, v in kwargs.items() if k in cls.FETCH_FIELDS}
+        histories, cls.failures = await Collector.aget_histories(
+            symbols, max_in_flight=max_in_flight, workers=workers, **fields)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(
+            cls._build, symbols, histories, **kwargs))
+
+    @classmethod
+    def materialize(cls, stocks: list, workers=Collector.MAX_WORKERS):
+        """Fetches the histories of the `stocks` still deferred in one batch.
+
+        Stocks are grouped by their fetch parameters and each group goes
+        through `Collector.get_histories`. Errors are recorded in `failures`.
+
+        Parameters:
+            stocks (list): Stock instances. Those already loaded are skipped.
+            workers (int): Max number of concurrent fetches.
+        """
+        groups = {}
+        for stock in stocks:
+            if stock.loaded:
+                continue
+            stock._loader = None
+            fields = tuple(getattr(stock, k) for k in cls.FETCH_FIELDS)
+            groups.setdefault(fields, []).append(stock)
+
+        cls.failures = {}
+        for fields, group in groups.items():
+            histories, failures = Collector.get_histories(
+                [stock.symbol for stock in group], workers=workers,
+                **dict(zip(cls.FETCH_FIELDS, fields)))
+            cls.failures.update(failures)
+            cls._attach(group, histories)
+
+    @staticmethod
+    def _parse_symbols(symbols: any):
+        """Returns `symbols` as a sorted list without duplicates."""
         if isinstance(symbols, str):
             symbols = symbols.split()
         if len(symbols) > 1:
             symbols = sorted(set(symbols))
-        return [Stock(symbol, **kwargs) for symbol in symbols]
+        return symbols
+
+    @classmethod
+    def _build(cls, symbols: list, histories: dict, **kwargs):
+        """Returns Stock instances for `symbols` with prefetched histories."""
+        stocks = [Stock(symbol, fetch=False, **kwargs) for symbol in symbols]
+        cls._attach(stocks, histories)
+        return stocks
+
+    @staticmethod
+    def _attach(stocks: list, histories: dict):
+        """Sets the histories of `stocks` from `histories`.
+
+        Indicators are computed through `BatchIndicators`, one call per group
+        of stocks sharing the same indicators and parameters.
+        """
+        groups = {}
+        for stock in stocks:
+            key = (tuple(stock.indicators), repr(sorted(stock._kwargs.items())))
+            groups.setdefault(key, []).append(stock)
 
+        for group in groups.values():
+            names = [indicator.upper() for indicator in group[0].indicators
+                     if indicator.upper() in IndicatorEngine.registry]
+            computed = {}
+            if names:
+                computed = BatchIndicators.compute(
+                    {stock.symbol: histories.get(stock.symbol)
+                     for stock in group}, names, **group[0]._kwargs)
+            for stock in group:
+                stock._set_history(histories.get(stock.symbol),
+                                   computed.get(stock.symbol))
 
 if __name__ == '__main__':
     pass
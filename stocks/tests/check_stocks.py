@@ -12,7 +12,13 @@ Checks stocks module.
 """
 
 
-from stocks import Stock, StockFactory
+import asyncio
+
+import numpy as np
+
+from collector import Collector
+from indicators import IndicatorEngine, Indicators
+from stocks import Sessions, Stock, StockFactory
 
 
 def check_stock_init():
@@ -28,15 +34,73 @@ def check_stock_init_with_rsi():
     print(stock.history)
 
 
+def check_stock_refresh_incremental():
+    print(f'--- check_stock_refresh_incremental() ---')
+    indicators = list(IndicatorEngine.registry)
+    stock = Stock('AAPL', period='5d', interval='1m', indicators=indicators,
+                  window=60)
+    history = stock.history[list(Collector.OHLCV)]
+    stock.history = history.iloc[:-30].copy()
+    stock.history = history.copy()
+    expected = IndicatorEngine.compute(history, indicators, window=60)
+    print(f"RSI matches Indicators.RSI: "
+          f"{expected['RSI'].equals(Indicators.RSI(history['Low'], 60))}")
+    # Rolling sums restart where the refreshed rows start, so values agree
+    # up to rounding.
+    for column in expected:
+        actual = stock.history[column]
+        close = np.allclose(actual, expected[column], rtol=0, atol=1e-9,
+                            equal_nan=True)
+        error = (actual - expected[column]).abs().max()
+        print(f'{column} matches full recompute: {close} '
+              f'(max diff {error:.1e})')
+
+
+def check_stock_sessions():
+    print(f'--- check_stock_sessions() ---')
+    stock = Stock('AAPL', period='5d', interval='1m')
+    history = stock.history
+    stock.history = history.iloc[:-30].copy()
+    stock.history = history
+    expected = Sessions.from_index(history.index)
+    print(f'Sessions: {list(stock.sessions.dates)}')
+    print(f'Matches full rebuild: '
+          f'{np.array_equal(stock.sessions.wall, expected.wall)}')
+
+
 def check_stock_factory():
     print(f'--- check_stock_factory() ---')
     symbols = ['AAPL', 'MSFT', 'AI', 'PLTR', 'CCL', 'U', 'V', 'V']
     stocks = StockFactory.create(symbols, indicators='RSI', window=60)
     for stock in stocks:
         print(f'--- {stock.symbol}---\n{stock.history}\n')
+    print(f'Failures: {StockFactory.failures}')
+
+
+def check_stock_factory_lazy():
+    print(f'--- check_stock_factory_lazy() ---')
+    symbols = ['AAPL', 'MSFT', 'AI', 'PLTR', 'CCL', 'U', 'V']
+    stocks = StockFactory.create(symbols, lazy=True, indicators='RSI')
+    print(f'Loaded: {[stock.loaded for stock in stocks]}')
+    print(f'--- {stocks[0].symbol}---\n{stocks[0].history}\n')
+    print(f'Loaded: {[stock.loaded for stock in stocks]}')
+
+
+def check_stock_factory_acreate():
+    print(f'--- check_stock_factory_acreate() ---')
+    symbols = ['AAPL', 'MSFT', 'AI', 'PLTR', 'CCL', 'U', 'V', 'V']
+    stocks = asyncio.run(
+        StockFactory.acreate(symbols, indicators='RSI', window=60))
+    for stock in stocks:
+        print(f'--- {stock.symbol}---\n{stock.history}\n')
+    print(f'Failures: {StockFactory.failures}')
 
 
 if __name__ == '__main__':
     check_stock_init()
     check_stock_init_with_rsi()
+    check_stock_refresh_incremental()
+    check_stock_sessions()
     check_stock_factory()
+    check_stock_factory_lazy()
+    check_stock_factory_acreate()
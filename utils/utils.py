@@ -1,3 +1,8 @@
+import re
+
+import pandas as pd
+
+
 def txt2symbols(path: str) -> list:
     with open(path, 'r') as f:
         symbols = [line.strip('\n') for line in f.readlines()]
@@ -26,3 +31,57 @@ def symbols2watchlist(symbols: list, size: int) -> dict:
             i += 1
             count = 0
     return watchlist_by_index
+
+
+def localize(timestamp, tz) -> pd.Timestamp:
+    """Returns `timestamp` as a pd.Timestamp in `tz`.
+
+    Naive timestamps are taken to be in `tz` already. If `tz` is None, the
+    time zone is dropped and the wall time kept.
+    """
+    timestamp = pd.Timestamp(timestamp)
+    if timestamp.tz is None:
+        return timestamp.tz_localize(tz)
+    if tz is None:
+        return timestamp.tz_localize(None)
+    return timestamp.tz_convert(tz)
+
+
+def period2start(period: str, now: pd.Timestamp) -> pd.Timestamp:
+    """Returns the timestamp `period` reaches back to from `now`.
+
+    Returns None for 'max', since the period has no lower bound.
+    """
+    if period == 'max':
+        return None
+    if period == 'ytd':
+        return now.normalize().replace(month=1, day=1)
+    n, unit = re.match(r'([0-9]+)(d|wk|mo|y)$', period).groups()
+    n = int(n)
+    if unit == 'd':
+        offset = pd.DateOffset(days=n)
+    elif unit == 'wk':
+        offset = pd.DateOffset(weeks=n)
+    elif unit == 'mo':
+        offset = pd.DateOffset(months=n)
+    else:
+        offset = pd.DateOffset(years=n)
+    return now.normalize() - offset
+
+
+def interval2timedelta(interval: str) -> pd.Timedelta:
+    """Returns the nominal length of a bar of `interval`.
+
+    Months are approximated as 30 days.
+    """
+    n, unit = re.match(r'([0-9]+)(m|h|d|wk|mo)$', interval).groups()
+    n = int(n)
+    if unit == 'm':
+        return pd.Timedelta(minutes=n)
+    if unit == 'h':
+        return pd.Timedelta(hours=n)
+    if unit == 'd':
+        return pd.Timedelta(days=n)
+    if unit == 'wk':
+        return pd.Timedelta(weeks=n)
+    return pd.Timedelta(days=30 * n)